@@ -1,3 +1,6 @@
 from .echo_algorithm import *
 from .ring_election import *
+from .hs_election import *
+from .wave_election import *
 from .dolev import *
+from .bracha import *
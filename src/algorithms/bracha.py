@@ -0,0 +1,134 @@
+import asyncio
+import math
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from .delivered import DeliveredSet
+from .dolev import DolevProtocol, DolevSettings, Message
+from .path_store import DisjointPathStore
+
+SEND = "S"
+ECHO = "E"
+READY = "R"
+
+# (origin, origin seq, content)
+BrachaKey = Tuple[int, int, str]
+
+
+def encode(kind: str, origin: int, seq: int, content: str) -> str:
+    return f"{kind}{origin}:{seq}:{content}"
+
+
+def decode(message: str) -> Optional[Tuple[str, int, int, str]]:
+    kind, rest = message[:1], message[1:]
+    origin, seq, content = rest.split(":", 2) if rest.count(":") >= 2 else (None, None, None)
+    if kind not in (SEND, ECHO, READY) or not (origin or "").isdigit() or not (seq or "").isdigit():
+        return None
+    return kind, int(origin), int(seq), content
+
+
+def check_size(node_count: int, max_fault: int) -> None:
+    if node_count <= 3 * max_fault:
+        raise ValueError(f"Bracha needs more than 3f nodes, got n={node_count} and f={max_fault}")
+
+
+@dataclass
+class _BroadcastState:
+    echoes: Set[int]
+    readies: Set[int]
+    # Loop time of the last ECHO or READY, undelivered broadcasts are dropped state_ttl seconds after it
+    last_seen: float
+    ready_sent: bool = False
+
+
+class BrachaProtocol(DolevProtocol):
+    """
+    Bracha's Byzantine reliable broadcast, with Dolev's reliable broadcast as authenticated transport between all
+    pairs of nodes (Bonomi et al., 2021). The origin Dolev-broadcasts SEND, every node Dolev-broadcasts ECHO on the
+    first SEND of a broadcast, READY on ceil((n + f + 1) / 2) ECHOs or f + 1 READYs, and delivers on 2f + 1 READYs.
+    Needs n > 3f.
+    """
+
+    def __init__(self, settings: DolevSettings) -> None:
+        # Fails when the community is built, before the node starts and waits for its neighbours
+        check_size(settings.node_count, settings.max_fault)
+        super().__init__(settings)
+        self.bracha_seq = 0
+        self.broadcasts: Dict[BrachaKey, _BroadcastState] = {}
+        self.echoed: Set[Tuple[int, int]] = set()
+        self.bracha_delivered = DeliveredSet(settings.delivered_window)
+
+    @property
+    def echo_quorum(self) -> int:
+        return math.ceil((self.node_count + self.max_fault + 1) / 2)
+
+    async def broadcast(self, message: str):
+        seq = self.bracha_seq
+        self.bracha_seq += 1
+        self.tracer.status("Bracha broadcasting {}", message)
+        payload = Message(encode(SEND, self.node_id, seq, message), self.node_id, self.new_seq(), (), self.timestamp())
+        await self.dolev_broadcast(payload)
+
+    def deliver(self, payload: Message, store: Optional[DisjointPathStore]):
+        decoded = decode(payload.message)
+        if decoded is None:
+            self.tracer.drop(payload.sender, "Malformed Bracha message: {}", payload.message)
+            return
+        kind, origin, seq, content = decoded
+        if kind == SEND:
+            # Only the origin itself can start a broadcast, and only once per sequence number
+            if payload.sender == origin and (origin, seq) not in self.echoed and not self._delivered(origin, seq):
+                self.echoed.add((origin, seq))
+                self._broadcast_phase(ECHO, origin, seq, content)
+            return
+
+        if self._delivered(origin, seq):
+            return
+        key = (origin, seq, content)
+        now = asyncio.get_running_loop().time()
+        state = self.broadcasts.get(key)
+        if state is None:
+            # Byzantine nodes can make up any number of these, so they are bounded like Dolev's paths (state_ttl)
+            state = self.broadcasts[key] = _BroadcastState(set(), set(), now)
+            self.metrics.observe_state("bracha_broadcasts", len(self.broadcasts))
+        state.last_seen = now
+        if kind == ECHO:
+            state.echoes.add(payload.sender)
+        else:
+            state.readies.add(payload.sender)
+
+        if not state.ready_sent and (
+            len(state.echoes) >= self.echo_quorum or len(state.readies) >= self.max_fault + 1
+        ):
+            state.ready_sent = True
+            self._broadcast_phase(READY, origin, seq, content)
+        if len(state.readies) >= 2 * self.max_fault + 1:
+            self.bracha_deliver(key)
+
+    def collect_garbage(self):
+        """
+        Also drop the ECHOs and READYs of Bracha broadcasts that have not been delivered and received none for
+        state_ttl seconds.
+        """
+        super().collect_garbage()
+        expired = asyncio.get_running_loop().time() - self.state_ttl
+        for key in [key for key, state in self.broadcasts.items() if state.last_seen < expired]:
+            del self.broadcasts[key]
+        self.metrics.observe_state("bracha_broadcasts", len(self.broadcasts))
+
+    def _broadcast_phase(self, kind: str, origin: int, seq: int, content: str) -> None:
+        payload = Message(encode(kind, origin, seq, content), self.node_id, self.new_seq(), (), self.timestamp())
+        self.register_anonymous_task("dolev_broadcast", self.dolev_broadcast, payload)
+
+    def _delivered(self, origin: int, seq: int) -> bool:
+        # At most one content is delivered per origin and sequence number, so the digest is always 0
+        return (origin, seq, 0) in self.bracha_delivered
+
+    def bracha_deliver(self, key: BrachaKey) -> None:
+        origin, seq, content = key
+        self.broadcasts.pop(key, None)
+        self.bracha_delivered.add((origin, seq, 0))
+        self.echoed.discard((origin, seq))
+        self.tracer.deliver(origin, "Bracha delivered from Node {}: {}", origin, content)
+        if len(self.bracha_delivered) == self.stop_after:
+            self.stop(self.stop_delay)
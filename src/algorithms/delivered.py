@@ -0,0 +1,66 @@
+from typing import Dict, Set, Tuple
+
+# (sender, sequence number, content digest)
+MessageKey = Tuple[int, int, int]
+
+
+class _SenderWindow:
+    __slots__ = ("base", "delivered")
+
+    def __init__(self) -> None:
+        # Every sequence number below base counts as delivered
+        self.base = 0
+        # Sequence number >= base -> digests delivered with it
+        self.delivered: Dict[int, Set[int]] = {}
+
+
+class DeliveredSet:
+    """
+    The broadcasts a node has delivered, identified by (sender, seq, digest), in memory bounded per sender.
+
+    Per sender only a low watermark is kept, below which everything counts as delivered, plus the sequence numbers
+    delivered out of order above it. The watermark moves up as the gaps fill. When broadcasts of one sender are
+    delivered more than `window` sequence numbers apart, the watermark is moved up regardless: older broadcasts of
+    that sender that were not delivered yet are then treated as delivered and ignored.
+    """
+
+    def __init__(self, window: int = 65536) -> None:
+        self.window = window
+        self.count = 0
+        self._senders: Dict[int, _SenderWindow] = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, key: MessageKey) -> bool:
+        sender, seq, digest = key
+        window = self._senders.get(sender)
+        if window is None:
+            return False
+        return seq < window.base or digest in window.delivered.get(seq, ())
+
+    def add(self, key: MessageKey) -> None:
+        if key in self:
+            return
+        sender, seq, digest = key
+        window = self._senders.get(sender)
+        if window is None:
+            window = self._senders[sender] = _SenderWindow()
+        self.count += 1
+        window.delivered.setdefault(seq, set()).add(digest)
+
+        floor = seq - self.window + 1
+        if floor > window.base:
+            # Too far ahead: give up on the undelivered broadcasts below the window
+            window.base = floor
+            window.delivered = {s: digests for s, digests in window.delivered.items() if s >= floor}
+        while window.base in window.delivered:
+            del window.delivered[window.base]
+            window.base += 1
+
+    def pending(self, sender: int) -> int:
+        """
+        Number of sequence numbers of the sender delivered out of order, i.e. kept above its watermark.
+        """
+        window = self._senders.get(sender)
+        return len(window.delivered) if window else 0
@@ -1,14 +1,18 @@
 import asyncio
-import json
-from multiprocessing import Process
-import random
-import time
+import hashlib
 import yaml
+from typing import Collection, Dict, Optional
 
 from ipv8.messaging.payload_dataclass import overwrite_dataclass
 from dataclasses import dataclass
 
-from da_types import DistributedAlgorithm, CommunitySettings, message_wrapper, Peer
+from da_types import DistributedAlgorithm, DistributedAlgorithmSettings, message_wrapper, Peer
+from delays import DelayModel
+from faults import FORGE
+from serialization import NodePath
+from tracing import DEBUG
+from .delivered import DeliveredSet, MessageKey
+from .path_store import DisjointPathStore
 
 # We are using a custom dataclass implementation.
 dataclass = overwrite_dataclass(dataclass)
@@ -17,11 +21,53 @@ dataclass = overwrite_dataclass(dataclass)
 @dataclass(msg_id=1)  # The value 1 identifies this message and must be unique per community.
 class Message:
     message: str
-    # I wanted Tuple[Int] as a type here. According to
-    # https://py-ipv8.readthedocs.io/en/latest/reference/serialization.html that should be possible, however it always
-    # returned errors, which I only managed to resolve using json serialization and deserialization.
     sender: int
-    path: str = '"[]"'
+    # Numbered per sender: (sender, seq) and a digest of the content identify a broadcast on every node
+    seq: int
+    # Tuple of node ids, packed as a compact id array (see serialization.py) instead of a JSON string
+    path: NodePath = ()
+    # Microseconds on the clock of the source (DistributedAlgorithm.clock) when it broadcast the message
+    broadcast_at: int = 0
+
+
+class DolevSettings(DistributedAlgorithmSettings):
+    broadcast_config: str = "config/dolev.yaml"
+    """YAML file with the broadcasts (messages and streams) every node performs."""
+
+    send_delay: str = "uniform:1.0:3.0"
+    """Artificial delay before every message to a neighbour, as a DelayModel spec (e.g. none or link:0.1:0.5)."""
+
+    max_in_flight: int = 1000
+    """Maximum number of delayed sends pending at once, further sends wait for a slot."""
+
+    max_fault: int = 1
+    """Number of Byzantine nodes tolerated: a broadcast is delivered after max_fault + 1 node-disjoint paths."""
+
+    stop_after: int = 0
+    """Stop once this many broadcasts have been delivered (0 never stops), e.g. to end a benchmark run."""
+
+    stop_delay: float = 1.0
+    """Seconds to keep relaying after the last delivery before stopping."""
+
+    state_ttl: float = 60.0
+    """Seconds without new paths after which the state of an undelivered broadcast is dropped."""
+
+    delivered_window: int = 65536
+    """Sequence numbers per sender that may be delivered out of order, see DeliveredSet."""
+
+    md: str = "123456"
+    """Enabled MD.1-MD.5 optimisations of Bonomi et al. (2021) as digits, e.g. "125", plus 6: no relaying of paths
+    that are a superset of a stored path; "none" runs plain Dolev."""
+
+
+def message_key(payload: Message) -> MessageKey:
+    # A digest instead of hash(): str hashes are randomised per process, so they would differ between nodes
+    digest = hashlib.blake2b(payload.message.encode(), digest_size=8).digest()
+    return payload.sender, payload.seq, int.from_bytes(digest, "big")
+
+
+def relay(payload: Message, path: NodePath = ()) -> Message:
+    return Message(payload.message, payload.sender, payload.seq, path, payload.broadcast_at)
 
 
 class DolevProtocol(DistributedAlgorithm):
@@ -31,120 +77,254 @@ class DolevProtocol(DistributedAlgorithm):
         DistributedAlgorithm (_type_): _description_
     """
 
-    def __init__(self, settings: CommunitySettings) -> None:
+    settings_class = DolevSettings
+
+    def __init__(self, settings: DolevSettings) -> None:
         super().__init__(settings)
+        self.broadcast_config = settings.broadcast_config
+        self.send_delay = DelayModel(settings.send_delay)
+        self.in_flight = asyncio.Semaphore(settings.max_in_flight)
         self.add_message_handler(Message, self.on_message)
-        self.message_info = {}
-        self.delivered = set()
-        self.max_fault = 1
-        self.md = True
-        self.trusted_neighbours = set()
+        # Paths per undelivered broadcast, freed on delivery or after state_ttl seconds without new paths
+        self.message_info: Dict[MessageKey, DisjointPathStore] = {}
+        # Loop time at which an undelivered broadcast was last received
+        self.last_seen: Dict[MessageKey, float] = {}
+        self.state_ttl = settings.state_ttl
+        self.delivered = DeliveredSet(settings.delivered_window)
+        # Number of paths in message_info, to measure the state Byzantine floods cause
+        self.stored_paths = 0
+        self.next_seq = 0
+        self.max_fault = settings.max_fault
+        self.stop_after = settings.stop_after
+        self.stop_delay = settings.stop_delay
+        self.md = {int(c) for c in settings.md if c in "123456"}
 
     async def on_start(self):
+        self.register_task("dolev_gc", self.collect_garbage, interval=self.state_ttl / 2, delay=self.state_ttl / 2)
         # read what to send
-        with open("config/dolev.yaml", "r") as f:
-            node_configs = yaml.safe_load(f)
-            node = node_configs.get(self.node_id, {'messages': ()})
-            for msg in node.get("messages", ()):
-                p = Process(
-                    target=self.dolev_broadcast,
-                    args=(
-                        Message(msg["message"], msg.get("sender", self.node_id), json.dumps(msg.get("path", ()))),
-                        msg["timeout"],
-                    ),
-                )
-                p.start()
-
-    def dolev_broadcast(self, msg: Message, timeout: int):
-        time.sleep(timeout)
-        self.status(f"Broadcasting {msg.message}")
-        self.dolev_deliver(msg)
-        asyncio.run(self.send(msg))
-
-    async def send(self, payload: Message):
-        path = json.loads(payload.path)
-        path_key = (payload.sender, hash(payload.message))
-
-        # Send to all neighbours that are not the sender, and have not delivered
-        for node_id, peer in filter(lambda x: x[0] not in path and x[0] not in self.message_info.get(path_key, {'neighbours':()})["neighbours"], self.nodes.items()):
-            await asyncio.sleep(random.uniform(1.0, 3.0))
-            self.status(f"Sending to {node_id}", f"{payload.message} {payload.path}")
-            self.ez_send(peer, payload)
-
-    def dolev_deliver(self, payload: Message):
-        path_key = (payload.sender, hash(payload.message))
-        if path_key not in self.delivered:
-            self.status(
-                f"\033[1;32;48mDelivered from Node {payload.sender}",
-                f"{payload.message} {self.message_info.pop((payload.sender, payload.message), set())}",
+        with open(self.broadcast_config, "r") as f:
+            node_configs = yaml.safe_load(f) or {}
+        node = node_configs.get(self.node_id, {'messages': ()})
+        for msg in node.get("messages", ()):
+            if "sender" not in msg and "path" not in msg and "seq" not in msg:
+                self.register_anonymous_task("broadcast", self.broadcast, msg["message"], delay=msg["timeout"])
+                continue
+            # A broadcast on behalf of another node or with a made-up path, as a Byzantine node would send it
+            self.register_anonymous_task(
+                "dolev_broadcast",
+                self.dolev_broadcast,
+                Message(
+                    msg["message"],
+                    msg.get("sender", self.node_id),
+                    msg["seq"] if "seq" in msg else self.new_seq(),
+                    tuple(msg.get("path", ())),
+                    self.timestamp(),
+                ),
+                delay=msg["timeout"],
+            )
+        for stream in node.get("streams", ()):
+            self.register_anonymous_task(
+                "dolev_stream",
+                self.dolev_stream,
+                stream["message"],
+                stream["count"],
+                stream["rate"],
+                delay=stream.get("timeout", 0),
             )
-            self.delivered.add(path_key)
+
+    async def dolev_stream(self, message: str, count: int, rate: float):
+        """
+        Broadcast `count` messages at `rate` messages per second. The message is formatted with its sequence number
+        ({seq}) so every broadcast is distinct. Pacing follows the loop clock, so slow handlers do not lower the rate.
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for seq in range(count):
+            delay = start + seq / rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.register_anonymous_task("broadcast", self.broadcast, message.format(seq=seq))
+
+    def timestamp(self) -> int:
+        return int(self.clock() * 1e6)
+
+    def new_seq(self) -> int:
+        seq = self.next_seq
+        self.next_seq += 1
+        return seq
+
+    def collect_garbage(self):
+        """
+        Drop the paths of broadcasts that have not been delivered and received no new path for state_ttl seconds.
+        """
+        expired = asyncio.get_running_loop().time() - self.state_ttl
+        for key in [key for key, last_seen in self.last_seen.items() if last_seen < expired]:
+            self.forget(key)
+
+    def forget(self, key: MessageKey) -> Optional[DisjointPathStore]:
+        self.last_seen.pop(key, None)
+        store = self.message_info.pop(key, None)
+        if store is not None:
+            self.stored_paths -= len(store)
+        return store
+
+    def add_path(self, store: DisjointPathStore, path: NodePath) -> bool:
+        stored = len(store)
+        complete = store.add(path)
+        self.stored_paths += len(store) - stored
+        self.metrics.observe_state("paths", self.stored_paths)
+        return complete
+
+    def corrupt(self, kind: str, node_id: Optional[int], payload: Message) -> Message:
+        if kind == FORGE:
+            suffix = f" (forged by {self.node_id})"
+            if payload.message.endswith(suffix):
+                # Already forged when it passed us before
+                return payload
+            return Message(payload.message + suffix, payload.sender, payload.seq, payload.path, payload.broadcast_at)
+        # A made-up path of up to f + 1 other nodes, an empty one claims to have delivered the broadcast (MD.2)
+        length = self.fault_rng.randint(0, self.max_fault + 1)
+        nodes = self.fault_rng.sample(range(self.node_count), min(self.node_count, length + 3))
+        path = [n for n in nodes if n not in (self.node_id, node_id, payload.sender)][:length]
+        return relay(payload, tuple(path))
+
+    async def flood(self, count: int, rate: float):
+        """
+        Relay `count` made-up broadcasts on behalf of other nodes, as if they came from their source directly.
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        others = [node_id for node_id in range(self.node_count) if node_id != self.node_id]
+        for i in range(count):
+            delay = start + i / rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sender = self.fault_rng.choice(others)
+            seq = self.fault_rng.randrange(1 << 16)
+            await self.send(Message(f"Forged {i} by {self.node_id}", sender, seq, (sender,), self.timestamp()))
+
+    async def broadcast(self, message: str):
+        """
+        Reliably broadcast a message of our own. Layered protocols (see bracha.py) override this.
+        """
+        await self.dolev_broadcast(Message(message, self.node_id, self.new_seq(), (), self.timestamp()))
+
+    async def dolev_broadcast(self, msg: Message):
+        self.tracer.status("Broadcasting {}", msg.message)
+        self.dolev_deliver(msg)
+        await self.send(msg)
+
+    async def send(self, payload: Message, skip: Collection[int] = ()):
+        path = payload.path
+
+        # Send to all neighbours that are not on the path, and have not delivered. Every neighbour gets its own
+        # (delayed) send task, so the fan-out happens concurrently and the caller only waits for a free slot.
+        for node_id, peer in filter(lambda x: x[0] not in path and x[0] not in skip, self.neighbours):
+            delay = self.send_delay.sample((self.node_id, node_id))
+            if not delay:
+                self.send_to(node_id, peer, payload)
+                continue
+            await self.in_flight.acquire()
+            self.register_anonymous_task("dolev_send", self.delayed_send, node_id, peer, payload, delay)
+
+    async def delayed_send(self, node_id: int, peer: Peer, payload: Message, delay: float):
+        try:
+            await asyncio.sleep(delay)
+            self.send_to(node_id, peer, payload)
+        finally:
+            self.in_flight.release()
+
+    def send_to(self, node_id: int, peer: Peer, payload: Message):
+        self.tracer.status("Sending to {}: {} {}", node_id, payload.message, list(payload.path), level=DEBUG)
+        self.ez_send(peer, payload)
+
+    def dolev_deliver(self, payload: Message, key: Optional[MessageKey] = None):
+        key = key or message_key(payload)
+        if key not in self.delivered:
+            store = self.forget(key)
+            if payload.sender != self.node_id and payload.broadcast_at:
+                # From the broadcast at the source to the delivery here, within a host the clocks agree
+                self.metrics.deliver_latency.observe(max(self.timestamp() - payload.broadcast_at, 0) / 1e6)
+            self.delivered.add(key)
+            self.deliver(payload, store)
+
+    def deliver(self, payload: Message, store: Optional[DisjointPathStore]):
+        """
+        Called once for every delivered broadcast. Layered protocols (see bracha.py) override this.
+        """
+        self.tracer.deliver(
+            payload.sender,
+            "Delivered from Node {}: {} {}",
+            payload.sender,
+            payload.message,
+            sorted(store.paths.values()) if store else [],
+        )
+        if len(self.delivered) == self.stop_after:
+            self.stop(self.stop_delay)
 
     @message_wrapper(Message)
     async def on_message(self, peer: Peer, payload: Message):
         peer.id = self.node_id_from_peer(peer)
-        path = (*json.loads(payload.path), peer.id)
-
-        if set(path).intersection(self.trusted_neighbours):
-            # MD 4 <-- not 100% on this
-            return
+        path = (*payload.path, peer.id)
 
         if len(set(path)) != len(path):
             # Path contains duplicate(s)
-            self.status(
-                f'\033[1;31;48mReceived erroneous message "{payload.message}" with duplicate nodes in path',
-                str(path),
+            self.tracer.drop(
+                peer.id, 'Received erroneous message "{}" with duplicate nodes in path: {}', payload.message, path
             )
             return
 
-        self.status(f"Received message from node {peer.id}", f"{payload.message} {payload.path}")
-        path_key = (payload.sender, hash(payload.message))
+        self.tracer.status(
+            "Received message from node {}: {} {}", peer.id, payload.message, list(payload.path), level=DEBUG
+        )
+        key = message_key(payload)
 
-        if self.md and path_key in self.delivered:
-            # MD5
+        if payload.sender == self.node_id and key not in self.delivered:
+            # Our own broadcasts are delivered as soon as we make them, anything else in our name is forged
+            self.tracer.drop(peer.id, 'Received forged message "{}" in our name', payload.message)
             return
 
+        if key in self.delivered:
+            if 5 in self.md:
+                # MD.5: after delivery, stop relaying the broadcast
+                return
+            if 2 in self.md:
+                # MD.2: after delivery, the paths are discarded and the broadcast is only relayed with an empty path.
+                # An empty path is a neighbour's notice that it has delivered, relaying on for those would never end
+                if payload.path:
+                    await self.send(relay(payload))
+                return
+            await self.send(relay(payload, path))
+            return
 
-        if path_key in self.message_info:
-            self.disjoint_add(path_key, path)
-
-            if self.md and len(path) == 1:
-                # Add neighbour to the no send list
-                self.message_info[path_key]["neighbours"].add(peer.id)
+        now = asyncio.get_running_loop().time()
+        store = self.message_info.get(key)
+        if store is None:
+            store = self.message_info[key] = DisjointPathStore(payload.sender, self.max_fault + 1)
+            self.metrics.observe_state("broadcasts", len(self.message_info))
+        self.last_seen[key] = now
 
-                if peer.id == payload.sender:
-                    # Message was recieved directly
-                    self.status(f"Received message directly from node {peer.id}", f"{payload.message}")
-                    self.dolev_deliver(payload)
-                    await self.send(Message(payload.message, payload.sender))
-                    return
+        if not payload.path and peer.id != payload.sender:
+            # An empty path from a neighbour: it has delivered the broadcast (MD.2)
+            store.neighbours.add(peer.id)
+        elif 4 in self.md and store.neighbours.intersection(payload.path):
+            # MD.4: paths through a neighbour that has delivered are useless, its own empty path supersedes them
+            return
+        # MD.3: never relay to neighbours that have delivered
+        skip = store.neighbours if 3 in self.md else ()
 
-            # the message from node path[0] has been received from at least f + 1 distinct paths
-            if len(self.message_info[path_key]) >= self.max_fault + 1:
-                self.dolev_deliver(payload)
-                await self.send(Message(payload.message, payload.sender, json.dumps(() if self.md else path)))
-            else:
-                await self.send(Message(payload.message, payload.sender, json.dumps(path)))
+        if 1 in self.md and peer.id == payload.sender and not payload.path:
+            # MD.1: received directly from the source (a source relaying a path received a forgery in its name)
+            self.tracer.status("Received message directly from node {}: {}", peer.id, payload.message)
+            self.dolev_deliver(payload, key)
+        elif 6 in self.md and store.covers(path):
+            # Every neighbour we would relay this path to got a path through a subset of its nodes already
+            return
+        elif self.add_path(store, path):
+            # the message from node path[0] has been received over at least f + 1 node-disjoint paths
+            self.dolev_deliver(payload, key)
         else:
-            self.message_info[path_key] = {"paths": {path}, "neighbours": set()}
-            await self.send(Message(payload.message, payload.sender, json.dumps(path)))
-
-    def disjoint_add(self, key, path):
-        s_path = set(path)
-        rm = []
-        for dp in self.message_info[key]['paths']:
-            s_dp = set(dp)
-            if s_path.issubset(s_dp):
-                # s_path smaller than s_dp
-                rm.append(dp)
-            if s_dp.issubset(s_path):
-                # s_path is not relevant
-                return
-        # add s_path and remove unnecessary paths
-        self.message_info[key]['paths'].add(path)
-        for dp in rm:
-            self.message_info[key]['paths'].remove(dp)
-
-
-    def status(self, description: str, content: str = ""):
-        print(f"[Node {self.node_id}] {description}{f': {content}' if content else ''}")
+            await self.send(relay(payload, path), skip=skip)
+            return
+        # MD.2: once delivered, relay with an empty path
+        await self.send(relay(payload, () if 2 in self.md else path), skip=skip)
@@ -0,0 +1,110 @@
+from ipv8.community import CommunitySettings
+from ipv8.messaging.payload_dataclass import overwrite_dataclass
+from dataclasses import dataclass
+
+from ipv8.types import Peer
+
+from da_types import DistributedAlgorithm, message_wrapper
+
+# We are using a custom dataclass implementation
+dataclass = overwrite_dataclass(dataclass)
+
+
+@dataclass(msg_id=1)
+class Probe:
+    elector: int
+    phase: int
+    hops: int
+
+
+@dataclass(msg_id=2)
+class Reply:
+    elector: int
+    phase: int
+
+
+@dataclass(msg_id=3)
+class Elected:
+    elector: int
+
+
+class HirschbergSinclair(DistributedAlgorithm):
+    """
+    Hirschberg-Sinclair leader election in a bidirectional ring, O(n log n) messages in the worst case.
+
+    In phase k a candidate probes 2^k hops in both directions. A node with a higher id swallows the probe, otherwise
+    the last node of the probe's range replies. A candidate that gets both replies goes to phase k + 1, one whose
+    probe travels around the whole ring is elected and announces itself. The highest id wins.
+    """
+
+    def __init__(self, settings: CommunitySettings) -> None:
+        super().__init__(settings)
+        self.started_election = False
+        self.candidate = False
+        self.phase = 0
+        self.replies = 0
+        self.leader = None
+        self.add_message_handler(Probe, self.on_probe)
+        self.add_message_handler(Reply, self.on_reply)
+        self.add_message_handler(Elected, self.on_leader)
+
+    def on_start(self):
+        if not self.started_election:
+            self.start_candidacy()
+
+    def start_candidacy(self) -> None:
+        self.started_election = True
+        self.candidate = True
+        self.tracer.status("Starting the election")
+        self.probe(0)
+
+    def probe(self, phase: int) -> None:
+        self.phase = phase
+        self.replies = 0
+        for _node_id, peer in self.neighbours:
+            self.ez_send(peer, Probe(self.node_id, phase, 1))
+
+    @message_wrapper(Probe)
+    async def on_probe(self, peer: Peer, payload: Probe) -> None:
+        # Neighbours may message us before all our own neighbours have introduced themselves
+        await self.ready.wait()
+        sender = self.node_id_from_peer(peer)
+        if payload.elector == self.node_id:
+            # Our probe went around the whole ring
+            if self.leader is None:
+                self.tracer.status("We are elected in phase {}!", payload.phase)
+                self.leader = self.node_id
+                self.ez_send(self.successor[1], Elected(self.node_id))
+            return
+        if payload.elector < self.node_id:
+            # Swallow the probe, a node that was not woken up yet starts its own candidacy
+            if not self.started_election:
+                self.start_candidacy()
+            return
+        self.started_election = True
+        self.candidate = False
+        if payload.hops < 2 ** payload.phase:
+            self.ez_send(self.next_hop(sender)[1], Probe(payload.elector, payload.phase, payload.hops + 1))
+        else:
+            self.ez_send(peer, Reply(payload.elector, payload.phase))
+
+    @message_wrapper(Reply)
+    async def on_reply(self, peer: Peer, payload: Reply) -> None:
+        await self.ready.wait()
+        if payload.elector != self.node_id:
+            self.ez_send(self.next_hop(self.node_id_from_peer(peer))[1], payload)
+            return
+        if not self.candidate or payload.phase != self.phase:
+            return
+        self.replies += 1
+        if self.replies == 2:
+            self.probe(self.phase + 1)
+
+    @message_wrapper(Elected)
+    async def on_leader(self, peer: Peer, payload: Elected) -> None:
+        await self.ready.wait()
+        if payload.elector != self.node_id:
+            self.leader = payload.elector
+            self.ez_send(self.next_hop(self.node_id_from_peer(peer))[1], payload)
+        self.tracer.status("Node {} is the leader, {} messages sent", payload.elector, self.metrics.sent_messages())
+        self.stop()
@@ -0,0 +1,173 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def _popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+class DisjointPathStore:
+    """
+    The paths over which a single broadcast has been received, used by Dolev to decide when to deliver.
+
+    Every path is kept as a bitset (an int) of its intermediate nodes, i.e. all nodes on the path apart from the
+    source. Only minimal paths are stored: a path whose nodes are a superset of a stored path can never help to find
+    more disjoint paths. The store keeps a selection of pairwise node-disjoint paths up to date on every add: a new
+    path is appended greedily when it is disjoint from the selection, otherwise an exact search is run for a
+    selection that contains the new path. The number of stored paths is bounded by max_paths, when it is exceeded
+    the longest unselected path is dropped.
+
+    Byzantine nodes can send many paths that never grow the selection, e.g. all through the same few nodes, and the
+    exact search is exponential in the selection size. It only runs when an upper bound, the size of a small set of
+    nodes that every path goes through, leaves room for a larger selection, and gives up after search_budget steps. A
+    search that gave up is repeated over all paths on the next add.
+    """
+
+    __slots__ = (
+        "source", "required", "max_paths", "search_budget", "paths", "neighbours", "direct", "_selected", "_used",
+        "_steps", "_stale",
+    )
+
+    def __init__(self, source: int, required: int, max_paths: int = 1024, search_budget: int = 10000) -> None:
+        self.source = source
+        self.required = required
+        self.max_paths = max_paths
+        self.search_budget = search_budget
+        # Bitset of intermediate nodes -> path as received
+        self.paths: Dict[int, Tuple[int, ...]] = {}
+        # Neighbours known to have delivered the broadcast (they relayed it with an empty path)
+        self.neighbours: Set[int] = set()
+        # Received directly from the source: a path without intermediate nodes, disjoint from every other path
+        self.direct = False
+        self._selected: List[int] = []
+        self._used = 0
+        # Search steps left in the current add, and whether a search gave up before it was exhaustive
+        self._steps = 0
+        self._stale = False
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def mask(self, path: Iterable[int]) -> int:
+        mask = 0
+        for node in path:
+            if node != self.source:
+                mask |= 1 << node
+        return mask
+
+    @property
+    def disjoint_paths(self) -> int:
+        return len(self._selected) + self.direct
+
+    def is_complete(self) -> bool:
+        """
+        Whether the store holds at least `required` node-disjoint paths.
+        """
+        return self.disjoint_paths >= self.required
+
+    def covers(self, path: Tuple[int, ...]) -> bool:
+        """
+        Whether a stored path uses a subset of the path's nodes, so the path adds nothing, neither here nor for the
+        neighbours the stored path has been relayed to.
+        """
+        mask = self.mask(path)
+        return any(known & mask == known for known in self.paths) if mask else self.direct
+
+    def add(self, path: Tuple[int, ...]) -> bool:
+        """
+        Store a path and return whether the store holds at least `required` node-disjoint paths.
+        """
+        if self.is_complete():
+            return True
+        mask = self.mask(path)
+        if not mask:
+            self.direct = True
+            return self.is_complete()
+        supersets = []
+        for known in self.paths:
+            if known & mask == known:
+                # A known path uses a subset of these nodes, the new path adds nothing
+                return False
+            if known & mask == mask:
+                supersets.append(known)
+        for known in supersets:
+            del self.paths[known]
+        self.paths[mask] = path
+
+        if supersets:
+            # Swapping a selected path for a subset of it keeps the selection disjoint
+            self._selected = [mask if known in supersets else known for known in self._selected]
+            self._selected = list(dict.fromkeys(self._selected))
+            self._used = 0
+            for known in self._selected:
+                self._used |= known
+        if mask not in self._selected and mask & self._used == 0:
+            self._selected.append(mask)
+            self._used |= mask
+            if self._stale:
+                self._search(0)
+        else:
+            # Either the new path overlaps the selection, or it replaced a selected superset and may now leave room
+            # for paths that were blocked by the superset
+            self._search(mask)
+        self._enforce_bound()
+        return self.is_complete()
+
+    def _search(self, mask: int) -> None:
+        if self._stale:
+            # An earlier search gave up, so a larger selection does not have to contain the new path
+            mask = 0
+        if self._max_disjoint(len(self._selected) + 1) <= len(self._selected):
+            self._stale = False
+            return
+        # Any larger selection has to contain the new path, otherwise an earlier add would have found it
+        candidates = sorted((known for known in self.paths if known & mask == 0 and known != mask), key=_popcount)
+        size = len(self._selected) + (0 if mask else 1)
+        self._steps = self.search_budget
+        selection = self._find_disjoint(candidates, size, mask)
+        # Out of steps, the selection may still grow
+        self._stale = self._steps < 0
+        if selection is not None:
+            self._selected = [mask, *selection] if mask else selection
+            self._used = 0
+            for known in self._selected:
+                self._used |= known
+
+    def _max_disjoint(self, size: int) -> int:
+        """
+        An upper bound on the number of pairwise disjoint stored paths, exact enough to stop at `size`. Disjoint paths
+        go through different nodes of any set of nodes that every path goes through (a hitting set), such as the first
+        hops, the last hops, or a set picked greedily by the number of paths through a node.
+        """
+        routes = [[node for node in path if node != self.source] for path in self.paths.values()]
+        bound = min(len({route[0] for route in routes}), len({route[-1] for route in routes}))
+        hitting = 0
+        while routes and hitting < min(bound, size):
+            counts = Counter(node for route in routes for node in route)
+            node = max(counts, key=counts.__getitem__)
+            routes = [route for route in routes if node not in route]
+            hitting += 1
+        return min(bound, size) if routes else min(bound, hitting)
+
+    def _find_disjoint(self, candidates: List[int], size: int, used: int) -> Optional[List[int]]:
+        """
+        Exact search for `size` pairwise disjoint masks among the candidates that avoid `used`, giving up (None) when
+        the steps of this add run out.
+        """
+        if size == 0:
+            return []
+        for i, candidate in enumerate(candidates):
+            self._steps -= 1
+            if self._steps < 0 or len(candidates) - i < size:
+                return None
+            if candidate & used:
+                continue
+            rest = self._find_disjoint(candidates[i + 1:], size - 1, used | candidate)
+            if rest is not None:
+                return [candidate, *rest]
+        return None
+
+    def _enforce_bound(self) -> None:
+        while len(self.paths) > self.max_paths:
+            longest = max((known for known in self.paths if known not in self._selected), key=_popcount)
+            del self.paths[longest]
@@ -1,6 +1,3 @@
-import asyncio
-import random
-
 from ipv8.community import CommunitySettings
 from ipv8.messaging.payload_dataclass import overwrite_dataclass
 from dataclasses import dataclass
@@ -38,34 +35,38 @@ class RingElection(DistributedAlgorithm):
         self.add_message_handler(ElectionMessage, self.on_message)
         self.add_message_handler(TerminationMessage, self.on_terminate)
 
-    async def on_start(self):
-        await asyncio.sleep(random.uniform(1.0, 3.0))
+    def on_start(self):
+        # Nodes start at random moments already (start_jitter), so with -nojitter all nodes start at once
         if not self.running:
-            peer = list(self.nodes.values())[0]
-            print(f"[Node {self.node_id}] Starting by selecting a node: {self.node_id_from_peer(peer)}")
+            node_id, peer = self.successor
+            self.tracer.status("Starting by selecting a node: {}", node_id)
             self.ez_send(peer, ElectionMessage(self.node_id))
 
     @message_wrapper(TerminationMessage)
     async def on_terminate(self, peer: Peer, _: TerminationMessage) -> None:
+        await self.ready.wait()
         if self.running:
-            _next_node_id, next_peer = [x for x in self.nodes.items() if x[1] != peer][0]
+            _next_node_id, next_peer = self.next_hop(self.node_id_from_peer(peer))
             self.ez_send(next_peer, TerminationMessage())
             self.running = False
+            self.tracer.status("Election finished, {} messages sent", self.metrics.sent_messages())
             self.stop()
 
     @message_wrapper(ElectionMessage)
     async def on_message(self, peer: Peer, payload: ElectionMessage) -> None:
+        # Neighbours may message us before all our own neighbours have introduced themselves
+        await self.ready.wait()
         self.running = True
         # Sending it around the ring to the other peer we received it from.
-        next_node_id, next_peer = [x for x in self.nodes.items() if x[1] != peer][0]
-        print(f"[Node {self.node_id}] Got a message from with elector id: {payload.elector}")
+        next_node_id, next_peer = self.next_hop(self.node_id_from_peer(peer))
+        self.tracer.status("Got a message from with elector id: {}", payload.elector)
 
         received_id = payload.elector
 
         if received_id == self.node_id:
             # We are elected
-            print(f"[Node {self.node_id}] we are elected!")
-            print(f"[Node {self.node_id}] Sending message to terminate the algorithm!")
+            self.tracer.status("we are elected!")
+            self.tracer.status("Sending message to terminate the algorithm!")
 
             self.ez_send(next_peer, TerminationMessage())
         elif received_id < self.node_id:
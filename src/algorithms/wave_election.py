@@ -0,0 +1,90 @@
+from typing import Optional
+
+from ipv8.community import CommunitySettings
+from ipv8.messaging.payload_dataclass import overwrite_dataclass
+from dataclasses import dataclass
+
+from ipv8.types import Peer
+
+from da_types import DistributedAlgorithm, message_wrapper
+
+# We are using a custom dataclass implementation
+dataclass = overwrite_dataclass(dataclass)
+
+
+@dataclass(msg_id=1)
+class Wave:
+    elector: int
+
+
+@dataclass(msg_id=2)
+class Leader:
+    elector: int
+
+
+class WaveElection(DistributedAlgorithm):
+    """
+    Leader election on any connected topology with the echo algorithm with extinction (Tel, "Introduction to
+    Distributed Algorithms", 7.3.1).
+
+    Every initiator, i.e. every node that has not been reached by a wave when it starts, starts an echo wave tagged
+    with its id. A node joins the wave with the highest id it has seen, waves with lower ids die out there. Only the
+    wave of the highest initiator completes, its initiator is elected and floods a Leader message; a node stops once
+    it has received it from all neighbours. O(n |E|) messages in the worst case, 2 |E| + 2 |E| with one initiator.
+    """
+
+    def __init__(self, settings: CommunitySettings) -> None:
+        super().__init__(settings)
+        # The wave we currently take part in, the neighbour it came from and the Wave messages received for it
+        self.wave: Optional[int] = None
+        self.father: Optional[Peer] = None
+        self.received = 0
+        self.leader: Optional[int] = None
+        self.leader_received = 0
+        self.add_message_handler(Wave, self.on_wave)
+        self.add_message_handler(Leader, self.on_leader)
+
+    def on_start(self):
+        if self.wave is None:
+            self.tracer.status("Starting a wave")
+            self.wave = self.node_id
+            for _node_id, peer in self.neighbours:
+                self.ez_send(peer, Wave(self.node_id))
+
+    @message_wrapper(Wave)
+    async def on_wave(self, peer: Peer, payload: Wave) -> None:
+        # Neighbours may message us before all our own neighbours have introduced themselves
+        await self.ready.wait()
+        if self.wave is not None and payload.elector < self.wave:
+            # Extinction: a wave with a lower id ends here
+            return
+        if self.wave is None or payload.elector > self.wave:
+            self.wave = payload.elector
+            self.father = peer
+            self.received = 0
+            sender = self.node_id_from_peer(peer)
+            for _node_id, neighbour in self.neighbours_except(sender):
+                self.ez_send(neighbour, Wave(payload.elector))
+        self.received += 1
+        if self.received < len(self.neighbours):
+            return
+        if self.wave == self.node_id:
+            self.tracer.status("We are elected!")
+            self.on_leader_elected(self.node_id)
+        else:
+            self.ez_send(self.father, Wave(self.wave))
+
+    def on_leader_elected(self, leader: int) -> None:
+        self.leader = leader
+        for _node_id, peer in self.neighbours:
+            self.ez_send(peer, Leader(leader))
+
+    @message_wrapper(Leader)
+    async def on_leader(self, peer: Peer, payload: Leader) -> None:
+        await self.ready.wait()
+        if self.leader is None:
+            self.on_leader_elected(payload.elector)
+        self.leader_received += 1
+        if self.leader_received == len(self.neighbours):
+            self.tracer.status("Node {} is the leader, {} messages sent", payload.elector, self.metrics.sent_messages())
+            self.stop()
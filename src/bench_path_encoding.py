@@ -0,0 +1,75 @@
+"""
+Compares the Dolev path encodings: the old JSON string field against the NodePath id array field.
+
+For every path length it reports the wire size of a packed Message and the cost of one hop (unpack the received
+message, append the previous hop to the path and pack the forwarded message).
+
+    python src/bench_path_encoding.py -nodes 1000 -repeat 20000
+"""
+import argparse
+import json
+import random
+import time
+import timeit
+from dataclasses import dataclass
+
+from ipv8.messaging.payload_dataclass import overwrite_dataclass
+from ipv8.messaging.serialization import Serializer
+
+from algorithms.dolev import Message, relay
+from serialization import register_formats
+
+dataclass = overwrite_dataclass(dataclass)
+
+
+@dataclass(msg_id=1)
+class JsonPathMessage:
+    message: str
+    sender: int
+    seq: int
+    path: str = '"[]"'
+    broadcast_at: int = 0
+
+
+def json_hop(serializer: Serializer, data: bytes, previous_hop: int) -> bytes:
+    payload, _ = serializer.unpack_serializable(JsonPathMessage, data)
+    path = (*json.loads(payload.path), previous_hop)
+    set(path)  # Dolev's duplicate check
+    return serializer.pack_serializable(
+        JsonPathMessage(payload.message, payload.sender, payload.seq, json.dumps(path), payload.broadcast_at)
+    )
+
+
+def array_hop(serializer: Serializer, data: bytes, previous_hop: int) -> bytes:
+    payload, _ = serializer.unpack_serializable(Message, data)
+    path = (*payload.path, previous_hop)
+    set(path)
+    return serializer.pack_serializable(relay(payload, path))
+
+
+def main(nodes: int, repeat: int, seed: int) -> None:
+    rng = random.Random(seed)
+    # Both variants carry the same fields apart from the path, a realistic broadcast timestamp in microseconds
+    broadcast_at = int(time.time() * 1e6)
+    serializer = register_formats(Serializer())
+    print(f"{'path len':>8} {'json B':>8} {'array B':>9} {'json us/hop':>12} {'array us/hop':>14}")
+    for length in (0, 1, 2, 4, 8, 16, 32, 64):
+        path = tuple(rng.sample(range(nodes), length))
+        previous_hop = nodes - 1
+        json_data = serializer.pack_serializable(JsonPathMessage("Hello there!", 0, 0, json.dumps(path), broadcast_at))
+        array_data = serializer.pack_serializable(Message("Hello there!", 0, 0, path, broadcast_at))
+        json_time = timeit.timeit(lambda: json_hop(serializer, json_data, previous_hop), number=repeat)
+        array_time = timeit.timeit(lambda: array_hop(serializer, array_data, previous_hop), number=repeat)
+        print(
+            f"{length:>8} {len(json_data):>8} {len(array_data):>9} "
+            f"{json_time / repeat * 1e6:>12.2f} {array_time / repeat * 1e6:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="Path encoding benchmark", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-nodes", type=int, default=1000, help="size of the node id space")
+    parser.add_argument("-repeat", type=int, default=20000, help="hops timed per path length")
+    parser.add_argument("-seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args.nodes, args.repeat, args.seed)
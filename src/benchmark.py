@@ -0,0 +1,293 @@
+"""
+Benchmarks the bundled algorithms on generated topologies of increasing size, degree and max_fault.
+
+Every run starts the nodes with run.py, traces them to JSONL files and records the messages, packets and bytes sent,
+the injected faults and the peak Dolev state from the metrics dumps, the time to the first and last delivery (Dolev)
+or to the last node stopping (echo, elections) from the traces, and CPU time and peak RSS per node. One JSON line per
+run is appended to the results file, so results of different versions can be compared.
+
+    python src/benchmark.py -algorithms election dolev -sizes 4 8 16 -degrees 3 5 -faults 1 2
+    python src/benchmark.py -algorithms election hs_election wave_election -sizes 16 64 256 -mode simulate
+
+Modes: "process" runs every node in its own local process (per-node CPU and RSS), "inprocess" runs all nodes in
+one process over UDP loopback, "simulate" runs them on the in-memory network in virtual time.
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from statistics import mean
+from typing import Dict, Iterable, List, Optional
+
+import yaml
+
+from topo_generator import generate, tolerates_faults
+from keys import load_keys
+from metrics import merge
+from topology import save_topology
+from tracing import read_trace
+
+RUN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run.py")
+MODES = ("process", "inprocess", "simulate")
+# Algorithms that do not run on a random graph
+FIXED_TOPOLOGIES = ("echo", "election", "hs_election")
+BASE_PORT = 9090
+
+
+def ring(n: int, descending: bool = False) -> Dict[int, List[int]]:
+    # Same ring as util.py: successor first. Descending ids along the ring are Chang-Roberts' worst case.
+    step = -1 if descending else 1
+    return {i: [(i + step) % n, (i - step) % n] for i in range(n)}
+
+
+def configurations(
+    algorithms: Iterable[str],
+    sizes: Iterable[int],
+    degrees: Iterable[int],
+    faults: Iterable[int],
+    mds: Iterable[str] = ("123456",),
+    injects: Iterable[str] = ("none",),
+) -> Iterable[dict]:
+    """
+    The runs of a sweep. Echo only runs between two nodes and the ring elections on a ring, the wave election varies
+    the degree. Dolev and Bracha vary the degree, max_fault, MD optimisations and injected faults; combinations that
+    cannot tolerate max_fault (degree < 2f + 1, or n <= 3f for Bracha) are skipped.
+    """
+    for algorithm in algorithms:
+        if algorithm == "echo":
+            yield {"algorithm": "echo", "nodes": 2, "degree": 1, "max_fault": 0}
+        elif algorithm in ("election", "hs_election"):
+            for n in sizes:
+                yield {"algorithm": algorithm, "nodes": n, "degree": 2, "max_fault": 0}
+        elif algorithm == "wave_election":
+            for n, k in itertools.product(sizes, degrees):
+                if k < n:
+                    yield {"algorithm": algorithm, "nodes": n, "degree": k, "max_fault": 0}
+        else:
+            for n, k, f, md, inject in itertools.product(sizes, degrees, faults, mds, injects):
+                if 2 * f + 1 <= k < n and (algorithm != "bracha" or n > 3 * f):
+                    yield {"algorithm": algorithm, "nodes": n, "degree": k, "max_fault": f, "md": md, "inject": inject}
+
+
+def build_topology(config: dict, seed: int, descending: bool = False):
+    """
+    The topology of a run: echo runs between two nodes, the ring elections on a ring and the other algorithms on a
+    random graph of config["model"] (a topo_generator model, k-vertex-connected by default).
+    """
+    n = config["nodes"]
+    if config["algorithm"] == "echo":
+        return {0: [1], 1: [0]}
+    if config["algorithm"] in FIXED_TOPOLOGIES:
+        return ring(n, descending)
+    graph = generate(config.get("model") or "connected", n, config["degree"], seed=seed)
+    if config["algorithm"] in ("dolev", "bracha") and not tolerates_faults(graph, config["max_fault"]):
+        raise ValueError(f"The topology is not {2 * config['max_fault'] + 1}-vertex-connected")
+    return graph
+
+
+def node_command(config: dict, node_id: str, topology: str, workdir: str, args: argparse.Namespace) -> List[str]:
+    command = [
+        sys.executable, RUN, node_id, topology, config["algorithm"],
+        "-nojitter", "-quiet", "-timeout", str(args.timeout),
+        "-trace", os.path.join(workdir, "trace-{node_id}.jsonl"),
+        "-metrics", os.path.join(workdir, "metrics-{node_id}.json"),
+        "-auth", args.auth, "-curve", args.curve,
+        "-baseport", str(args.baseport),
+    ]
+    if config["algorithm"] in ("dolev", "bracha"):
+        command += [
+            "-config", os.path.join(workdir, "broadcasts.yaml"),
+            "-delay", args.delay,
+            "-maxfault", str(config["max_fault"]),
+            "-md", config["md"],
+            "-stopafter", str(min(args.broadcasts, config["nodes"])),
+        ]
+        if config["inject"] != "none":
+            command += ["-inject", config["inject"]]
+    if args.batch:
+        command.append("-batch")
+    if node_id == "all" and args.mode == "simulate":
+        command += ["-simulate", "-seed", str(args.seed)]
+    return command
+
+
+def wait_all(processes: Dict[int, subprocess.Popen], deadline: float) -> Dict[int, Optional[resource.struct_rusage]]:
+    """
+    Reap the processes with their resource usage, interrupting the ones still running at the deadline and killing
+    them 10 seconds later.
+    """
+    usage: Dict[int, Optional[resource.struct_rusage]] = {}
+    running = dict(processes)
+    signals = [(deadline, signal.SIGINT), (deadline + 10, signal.SIGKILL)]
+    while running:
+        if signals and time.time() > signals[0][0]:
+            _, sig = signals.pop(0)
+            for process in running.values():
+                process.send_signal(sig)
+        for node_id, process in list(running.items()):
+            pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                process.returncode = status  # reaped here, Popen must not wait for it again
+                usage[node_id] = rusage
+                del running[node_id]
+        time.sleep(0.05)
+    return usage
+
+
+def summarise(traces: Dict[int, List[dict]], merged: dict) -> dict:
+    """
+    Message and packet totals from the merged metrics, start, stop and delivery times from the traces. Messages are
+    the algorithm's messages, packets what went over the wire: without batching every message is a packet, with
+    batching a Batch packet carries several messages.
+    """
+    totals = {
+        "messages": merged["messages"]["sent"],
+        "message_bytes": merged["messages"]["sent_bytes"],
+        "received": merged["messages"]["received"],
+        "packets": merged["packets"]["sent"],
+        "bytes": merged["packets"]["sent_bytes"],
+        "trace_dropped": merged["trace_dropped"],
+    }
+    events = [event for trace in traces.values() for event in trace]
+    starts = [e["t"] for e in events if e["kind"] == "start"]
+    if not starts:
+        return {**totals, "started": 0}
+    t0 = min(starts)
+    deliveries = [e["t"] - t0 for e in events if e["kind"] == "deliver"]
+    stops = [e["t"] - t0 for e in events if e["kind"] == "stop"]
+    return {
+        **totals,
+        "started": len(starts),
+        "stopped": len(stops),
+        "deliveries": len(deliveries),
+        "first_delivery": min(deliveries, default=None),
+        "last_delivery": max(deliveries, default=None),
+        "last_stop": max(stops, default=None),
+    }
+
+
+def run_benchmark(config: dict, args: argparse.Namespace) -> dict:
+    n = config["nodes"]
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        topology = build_topology(config, args.seed, args.descending)
+        if config["algorithm"] in ("dolev", "bracha"):
+            broadcasts = {i: {"messages": [{"message": f"Broadcast {i}", "timeout": 1}]} for i in
+                          range(min(args.broadcasts, n))}
+            with open(os.path.join(workdir, "broadcasts.yaml"), "w") as f:
+                yaml.safe_dump(broadcasts, f)
+        topology_file = os.path.join(workdir, "topology.topo")
+        save_topology(topology_file, topology)
+
+        started = time.time()
+        node_ids = range(n) if args.mode == "process" else ("all",)
+        processes = {
+            i: subprocess.Popen(node_command(config, str(i), topology_file, workdir, args), stdout=subprocess.DEVNULL)
+            for i in node_ids
+        }
+        usage = wait_all(processes, started + args.limit)
+        wall = time.time() - started
+
+        traces = {}
+        for node_id in range(n):
+            path = os.path.join(workdir, f"trace-{node_id}.jsonl")
+            traces[node_id] = read_trace(path) if os.path.exists(path) else []
+        snapshots = []
+        for node_id in range(n):
+            path = os.path.join(workdir, f"metrics-{node_id}.json")
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    snapshots.append(json.load(f))
+        merged = merge(snapshots)
+
+    cpu = [u.ru_utime + u.ru_stime for u in usage.values() if u is not None]
+    rss = [u.ru_maxrss for u in usage.values() if u is not None]  # KiB on Linux
+    return {
+        **config,
+        "mode": args.mode,
+        "seed": args.seed,
+        "delay": args.delay if "md" in config else None,
+        "batch": args.batch,
+        "auth": args.auth,
+        "curve": args.curve,
+        "wall": wall,
+        **summarise(traces, merged),
+        "faults": merged["faults"],
+        "max_state": merged["max_state"],
+        "cpu_total": sum(cpu),
+        "cpu_max": max(cpu, default=None),
+        "cpu_mean": mean(cpu) if cpu else None,
+        "rss_max_kb": max(rss, default=None),
+        "rss_mean_kb": mean(rss) if rss else None,
+        "per_node_cpu": cpu if args.mode == "process" else None,
+    }
+
+
+def version() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def fmt(value, spec: str = "") -> str:
+    return "-" if value is None else format(value, spec)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="Benchmark", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-algorithms", type=str, nargs="+", default=["echo", "election", "dolev"])
+    parser.add_argument("-sizes", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("-degrees", type=int, nargs="+", default=[3, 5])
+    parser.add_argument("-faults", type=int, nargs="+", default=[1])
+    parser.add_argument("-md", type=str, nargs="+", default=["123456"], help="dolev optimisations, e.g. 123456 none")
+    parser.add_argument("-inject", type=str, nargs="+", default=["none"], help="fault files (see faults.py) or none")
+    parser.add_argument("-broadcasts", type=int, default=2, help="number of dolev nodes that broadcast a message")
+    parser.add_argument("-delay", type=str, default="none", help="artificial delay model of dolev sends")
+    parser.add_argument("-descending", action="store_true", help="ring ids decrease along the successors")
+    parser.add_argument("-batch", action="store_true")
+    parser.add_argument("-auth", type=str, default="signature", choices=("signature", "mac", "none"))
+    parser.add_argument("-curve", type=str, default="medium", help="key type of the nodes, see keys.py")
+    parser.add_argument("-mode", type=str, default="process", choices=MODES)
+    parser.add_argument("-baseport", type=int, default=BASE_PORT, help="UDP port of node 0")
+    parser.add_argument("-seed", type=int, default=0)
+    parser.add_argument("-repeat", type=int, default=1)
+    parser.add_argument("-timeout", type=float, default=30, help="seconds a node waits for its neighbours")
+    parser.add_argument("-limit", type=float, default=120, help="seconds after which a run is interrupted")
+    parser.add_argument("-out", type=str, default="bench/results.jsonl")
+    args = parser.parse_args()
+
+    commit = version()
+    # Generate the nodes' keys once, instead of in the nodes of every run
+    load_keys(max(args.sizes + [2]), args.curve)
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    print(f"{'algorithm':>9} {'n':>5} {'k':>3} {'f':>2} {'md':>6} {'msgs':>8} {'packets':>8} {'bytes':>10} "
+          f"{'first':>7} {'last':>7} {'cpu max':>8} {'rss MiB':>8} {'paths':>7} {'inject':>12}")
+    for config, repetition in itertools.product(
+        configurations(args.algorithms, args.sizes, args.degrees, args.faults, args.md, args.inject), range(args.repeat)
+    ):
+        result = run_benchmark(config, args)
+        result.update(repetition=repetition, version=commit, timestamp=time.time())
+        with open(args.out, "a") as f:
+            f.write(json.dumps(result) + "\n")
+        last = result.get("last_delivery") if "md" in config else result.get("last_stop")
+        rss = result["rss_max_kb"] / 1024 if result["rss_max_kb"] else None
+        print(
+            f"{config['algorithm']:>9} {config['nodes']:>5} {config['degree']:>3} {config['max_fault']:>2} "
+            f"{config.get('md', '-'):>6} "
+            f"{fmt(result.get('messages')):>8} {fmt(result.get('packets')):>8} {fmt(result.get('bytes')):>10} "
+            f"{fmt(result.get('first_delivery'), '.3f'):>7} {fmt(last, '.3f'):>7} "
+            f"{fmt(result['cpu_max'], '.2f'):>8} {fmt(rss, '.1f'):>8} "
+            f"{fmt(result['max_state'].get('paths')):>7} {os.path.basename(config.get('inject', '-')):>12}"
+        )
+        if result["trace_dropped"]:
+            print(f"Warning: {result['trace_dropped']} trace events were dropped, the delivery times are incomplete")
+    print(f"Results appended to {args.out}")
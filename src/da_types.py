@@ -1,34 +1,321 @@
 from __future__ import annotations
 
 import random
+import sys
+import time
 import typing
-from asyncio import Event
-from typing import Dict, List, Tuple, Callable
+from asyncio import Event, TimerHandle, ensure_future, get_running_loop, iscoroutine, sleep
+from dataclasses import dataclass
+from functools import wraps
+from hashlib import blake2b
+from hmac import compare_digest
+from traceback import format_exception
+from typing import Dict, List, Optional, Tuple, Callable
+from aiohttp import web
 from ipv8.community import Community, CommunitySettings
-from ipv8.lazy_community import lazy_wrapper
-from ipv8.messaging.serialization import Payload
-from ipv8.types import Peer, LazyWrappedHandler, MessageHandlerFunction
+from ipv8.lazy_community import PacketDecodingError
+from ipv8.messaging.payload_dataclass import overwrite_dataclass, type_from_format
+from ipv8.messaging.payload_headers import BinMemberAuthenticationPayload
+from ipv8.messaging.serialization import Payload, Serializer
+from ipv8.types import Address, Peer, LazyWrappedHandler, MessageHandlerFunction
+
+from faults import CRASH, DELAY, FORGE, SILENT, Fault, load_fault
+from inbound import InboundQueue
+from keys import link_key
+from metrics import Metrics, udp_drops
+from serialization import register_formats
+from tracing import DEBUG, LEVELS, Tracer
 
 DataclassPayload = typing.TypeVar("DataclassPayload")
 AnyPayload = typing.Union[Payload, DataclassPayload]
 
+# We are using a custom dataclass implementation.
+dataclass = overwrite_dataclass(dataclass)
+
+# Message ids from 200 upwards are reserved for the messages of DistributedAlgorithm itself
+BATCH_MSG_ID = 200
+FrameList = type_from_format("varlenH-list")
+
+SIGNATURE = "signature"
+MAC = "mac"
+NONE = "none"
+AUTH_MODES = (SIGNATURE, MAC, NONE)
+MAC_SIZE = 16
+
+
+@dataclass(msg_id=BATCH_MSG_ID)
+class Batch:
+    # Every frame is the message id of a payload followed by the serialized payload(s)
+    frames: FrameList
+
 
 def message_wrapper(*payloads: type[AnyPayload]) -> Callable[[LazyWrappedHandler], MessageHandlerFunction]:
-    return lazy_wrapper(*payloads)
+    def decorator(func: LazyWrappedHandler) -> MessageHandlerFunction:
+        @wraps(func)
+        def wrapper(self: DistributedAlgorithm, source_address: Address, data: bytes, peer: Optional[Peer] = None):
+            if peer is None:
+                peer, remainder = self.authenticate(source_address, data, payloads)
+                self.metrics.on_packet_received(len(data))
+                unpacked = self.serializer.unpack_serializable_list(payloads, remainder, offset=23)
+            else:
+                # A frame of a Batch: the batch packet already authenticated the peer
+                unpacked = self.serializer.unpack_serializable_list(payloads, data, offset=1)
+            return self.dispatch(func, peer, unpacked, len(data))
+
+        return wrapper
+
+    return decorator
+
+
+class DistributedAlgorithmSettings(CommunitySettings):
+    """
+    Settings shared by all algorithms, filled from the "initialize" mapping of the overlay configuration.
+    """
+
+    walk_interval: float = 0.5
+    """Seconds between the first introduction requests to neighbours that have not answered yet."""
+
+    walk_backoff: float = 2.0
+    """Factor by which the interval between introduction requests grows after every unanswered round."""
+
+    walk_max_interval: float = 2.0
+    """Upper bound on the interval between introduction requests."""
+
+    connect_timeout: Optional[float] = None
+    """Seconds to wait for all neighbours before giving up and stopping the node, None waits forever."""
+
+    start_jitter: Optional[Tuple[float, float]] = (1.0, 3.0)
+    """Random delay range before on_start is called once all neighbours are connected, None starts immediately."""
+
+    batching: bool = False
+    """Coalesce the payloads sent to the same peer into Batch packets."""
+
+    batch_max_bytes: int = 1200
+    """A peer's batch is sent as soon as its frames reach this size (or hold 255 frames)."""
+
+    batch_delay: float = 0.005
+    """Seconds a payload may wait in a batch before the batch is sent anyway."""
+
+    trace_level: str = "debug"
+    """Lowest level of the traced events: debug (includes every send/receive), info or off."""
+
+    trace_console: bool = True
+    """Print status, start/stop and delivery events to the console."""
+
+    trace_file: Optional[str] = None
+    """JSONL file to write all traced events to, "{node_id}" is replaced by the node's id."""
+
+    trace_capacity: int = 65536
+    """Number of events buffered between two writes to the trace file."""
+
+    trace_flush_interval: float = 1.0
+    """Seconds between two writes to the trace file."""
+
+    metrics_file: Optional[str] = None
+    """JSON file the node's metrics are dumped to on stop, "{node_id}" is replaced by the node's id."""
+
+    metrics_interval: float = 0.0
+    """Seconds between two metrics dumps while running, 0 only dumps on stop."""
+
+    metrics_port: int = 0
+    """Serve the metrics as JSON on http://localhost:<metrics_port + node id>/metrics, 0 disables the endpoint."""
+
+    node_count: int = 0
+    """Number of nodes in the topology (set by run.py), e.g. for quorums or to pick random faulty nodes."""
+
+    fault_config: Optional[str] = None
+    """YAML file with the nodes that crash, stay silent, delay, forge or tamper with messages, see faults.py."""
+
+    auth: str = SIGNATURE
+    """How packets are authenticated: signature signs every packet with the node's key, mac appends a MAC with a
+    key per link (derived from both nodes' keys once), none trusts the source address (trusted simulations only)."""
+
+    inbound_queue: int = 0
+    """Received messages that may wait for a handler, 0 runs every handler directly on the receive path."""
+
+    inbound_workers: int = 1
+    """Handlers of queued messages running at once."""
+
+    inbound_order: str = "fifo"
+    """fifo handles the messages of a sender one at a time in arrival order, unordered uses any free worker."""
+
+    inbound_overload: str = "backpressure"
+    """When the inbound queue is full: drop the new message, shed the oldest message of the busiest sender, or
+    backpressure: stop reading from the network until the queue is half empty, the OS may then drop datagrams."""
 
 
 class DistributedAlgorithm(Community):
     # @Todo: Make sure this is configurable
     community_id = b"\x05" * 20
+    settings_class = DistributedAlgorithmSettings
 
-    def __init__(self, settings: CommunitySettings) -> None:
+    def __init__(self, settings: DistributedAlgorithmSettings) -> None:
         super().__init__(settings)
         self.event: Event = None  # type:ignore
         # Register the message handler for messages (with the identifier "1").
         self.nodes: Dict[int, Peer] = {}
+        self.ready = Event()
+        self.walk_interval = settings.walk_interval
+        self.walk_backoff = settings.walk_backoff
+        self.walk_max_interval = settings.walk_max_interval
+        self.connect_timeout = settings.connect_timeout
+        self.start_jitter = settings.start_jitter
+        # Port -> node id of the neighbours we have not been introduced to yet
+        self._pending_ports: Dict[int, int] = {}
+        self._neighbour_addresses: Dict[int, Address] = {}
+        # Peer -> node id indices, so handlers can identify the sender in O(1)
+        self._node_by_mid: Dict[bytes, int] = {}
+        self._node_by_address: Dict[Address, int] = {}
+        self.connections: List[Tuple[int, int]] = []
+        self._neighbour_items: Optional[Tuple[Tuple[int, Peer], ...]] = None
+        self._neighbours_except: Dict[int, Tuple[Tuple[int, Peer], ...]] = {}
+        if settings.auth not in AUTH_MODES:
+            raise ValueError(f"Unknown auth mode {settings.auth!r}, expected one of {', '.join(AUTH_MODES)}")
+        self.auth = settings.auth
+        # Peer mid -> key of the link to that peer, for the mac auth mode
+        self._link_keys: Dict[bytes, bytes] = {}
+        self.batching = settings.batching
+        self.batch_max_bytes = settings.batch_max_bytes
+        self.batch_delay = settings.batch_delay
+        # Address -> (peer, queued frames, queued bytes) and the timers that flush them
+        self._outbox: Dict[Address, Tuple[Peer, List[bytes], int]] = {}
+        self._flush_timers: Dict[Address, TimerHandle] = {}
+        loop = get_running_loop()
+        # A clock all nodes of a run agree on (within the host): virtual time when simulated, wall-clock time otherwise
+        self.clock: Callable[[], float] = loop.time if getattr(loop, "virtual_time", False) else time.time
+        self.tracer = Tracer(
+            level=LEVELS[settings.trace_level],
+            console=settings.trace_console,
+            path=settings.trace_file,
+            capacity=settings.trace_capacity,
+            clock=self.clock,
+        )
+        self.trace_flush_interval = settings.trace_flush_interval
+        self.metrics = Metrics()
+        self.metrics_file = settings.metrics_file
+        self.metrics_interval = settings.metrics_interval
+        self.metrics_port = settings.metrics_port
+        self._metrics_runner: Optional[web.AppRunner] = None
+        self.node_count = settings.node_count
+        self.fault_config = settings.fault_config
+        # The fault of this node (None for a correct node), injected once faulty is set
+        self.fault: Optional[Fault] = None
+        self.fault_rng = random.Random()
+        self.faulty = False
+        self.crashed = False
+        self.inbound: Optional[InboundQueue] = None
+        if settings.inbound_queue > 0:
+            self.inbound = InboundQueue(
+                settings.inbound_queue,
+                settings.inbound_workers,
+                settings.inbound_order,
+                settings.inbound_overload,
+                self._start_queued,
+                self._pause_receiving,
+            )
+        self.add_message_handler(Batch, self.on_batch)
+
+    def get_serializer(self) -> Serializer:
+        # Adds the compact formats of serialization.py (e.g. NodePath) to the default ipv8 ones
+        return register_formats(super().get_serializer())
+
+    def register_node(self, node_id: int, peer: Peer) -> None:
+        self.nodes[node_id] = peer
+        self._node_by_mid[peer.mid] = node_id
+        self._node_by_address[tuple(peer.address)] = node_id
+        self._neighbour_items = None
+        if self.auth == MAC:
+            # Set up the link key once, instead of on the first packet
+            self.link_key(peer)
+
+    def link_key(self, peer: Peer) -> bytes:
+        key = self._link_keys.get(peer.mid)
+        if key is None:
+            key = self._link_keys[peer.mid] = link_key(self.my_peer.key, peer.public_key)
+        return key
 
-    def node_id_from_peer(self, peer: Peer):
-        return next((key for key, p in self.nodes.items() if p == peer), None)
+    def mac(self, peer: Peer, data: bytes) -> bytes:
+        return blake2b(data, digest_size=MAC_SIZE, key=self.link_key(peer)).digest()
+
+    def pack(self, peer: Peer, msg_id: int, payloads: Tuple[AnyPayload, ...], sig: bool = True) -> bytes:
+        """
+        A packet with the payloads, authenticated for peer as the auth mode says (unless sig is False).
+        """
+        if sig and self.auth == SIGNATURE:
+            return self.ezr_pack(msg_id, *payloads)
+        packet = self._ez_pack(self.get_prefix(), msg_id, payloads, sig=False)
+        if sig and self.auth == MAC:
+            packet += self.mac(peer, packet)
+        return packet
+
+    def authenticate(self, source_address: Address, data: bytes, payloads: tuple) -> Tuple[Peer, bytes]:
+        """
+        The peer that sent a packet and the packet without its authentication. Raises a PacketDecodingError if the
+        packet does not authenticate.
+        """
+        if self.auth == SIGNATURE:
+            # Same as ipv8's lazy_wrapper: verify the signature and look up the signing peer
+            auth, _ = self.serializer.unpack_serializable(BinMemberAuthenticationPayload, data, offset=23)
+            signature_valid, remainder = self._verify_signature(auth, data)
+            if not signature_valid:
+                raise PacketDecodingError(f"Incoming packet {[p.__name__ for p in payloads]} has an invalid signature")
+            peer = (self.network.verified_by_public_key_bin.get(auth.public_key_bin)
+                    or Peer(auth.public_key_bin, source_address))
+            return peer, remainder
+        # Without signatures the sender is the peer at the source address, introduced (with a signature) before
+        node_id = self.node_id_from_address(source_address)
+        peer = self.nodes.get(node_id) if node_id is not None else None
+        peer = peer or self.network.get_verified_by_address(source_address)
+        if peer is None:
+            raise PacketDecodingError(f"Incoming packet {[p.__name__ for p in payloads]} from unknown {source_address}")
+        if self.auth == MAC:
+            data, tag = data[:-MAC_SIZE], data[-MAC_SIZE:]
+            if not compare_digest(tag, self.mac(peer, data)):
+                raise PacketDecodingError(f"Incoming packet {[p.__name__ for p in payloads]} has an invalid MAC")
+        return peer, data
+
+    def node_id_from_peer(self, peer: Peer) -> Optional[int]:
+        node_id = self._node_by_mid.get(peer.mid)
+        if node_id is None:
+            node_id = self._node_by_address.get(tuple(peer.address))
+        return node_id
+
+    def node_id_from_address(self, address: Address) -> Optional[int]:
+        return self._node_by_address.get(tuple(address))
+
+    @property
+    def neighbours(self) -> Tuple[Tuple[int, Peer], ...]:
+        """
+        All (node id, peer) pairs of our (connected) neighbours, in topology order.
+        """
+        if self._neighbour_items is None:
+            self._neighbour_items = tuple((node_id, self.nodes[node_id]) for node_id, _ in self.connections
+                                          if node_id in self.nodes)
+            self._neighbours_except.clear()
+        return self._neighbour_items
+
+    @property
+    def successor(self) -> Tuple[int, Peer]:
+        """
+        The first neighbour in the topology, the next node in a (unidirectional) ring.
+        """
+        return self.neighbours[0]
+
+    def neighbours_except(self, node_id: Optional[int]) -> Tuple[Tuple[int, Peer], ...]:
+        """
+        All (node id, peer) pairs of our neighbours apart from node_id, computed once per excluded node.
+        """
+        view = self._neighbours_except.get(node_id)
+        if view is None:
+            view = tuple(item for item in self.neighbours if item[0] != node_id)
+            self._neighbours_except[node_id] = view
+        return view
+
+    def next_hop(self, node_id: Optional[int]) -> Tuple[int, Peer]:
+        """
+        The neighbour to forward to after receiving from node_id, i.e. the other side of a ring.
+        """
+        return self.neighbours_except(node_id)[0]
 
     async def started(
         self, node_id: int, connections: List[Tuple[int, int]], event: Event, use_localhost: bool = True
@@ -36,47 +323,311 @@ class DistributedAlgorithm(Community):
         self.event = event
         self.node_id = node_id
         self.connections = connections
-        self.on_start_delay = random.uniform(1.0, 3.0)  # Seconds
+        self.tracer.node_id = node_id
+        if self.tracer.path:
+            self.tracer.path = self.tracer.path.format(node_id=node_id)
+            self.register_task("trace_flush", self.tracer.flush, interval=self.trace_flush_interval)
+        self.metrics.node_id = node_id
+        if self.metrics_file:
+            self.metrics_file = self.metrics_file.format(node_id=node_id)
+        if self.metrics_interval:
+            self.register_task("metrics_export", self.export_metrics, interval=self.metrics_interval)
+        if self.metrics_port:
+            await self._start_metrics_server(self.metrics_port + node_id)
+        if self.fault_config:
+            # Dolev and Bracha tolerate max_fault faulty nodes, the other algorithms none in particular
+            max_fault = getattr(self, "max_fault", None)
+            self.fault, self.fault_rng = load_fault(self.fault_config, node_id, self.node_count, max_fault)
+        self.on_start_delay = random.uniform(*self.start_jitter) if self.start_jitter else 0  # Seconds
         host_network = self._get_lan_address()[0]
         host_network_base = ".".join(host_network.split(".")[:3])
 
-        async def _ensure_nodes_connected() -> None:
-            # Make connections to known peers
-            for node_id, conn in connections:
-                ip_address = f"{host_network_base}.{node_id + 10}"
-                if use_localhost:
-                    ip_address = host_network
-                ad = (ip_address, conn)
-                self.walk_to(ad)
-            valid = False
-            conn_nodes = []
-
-            for node_id, node_port in self.connections:
-                conn_nodes = [p for p in self.get_peers() if p.address[1] == node_port]
-                if len(conn_nodes) == 0:
-                    return
-                valid = True
-                self.nodes[node_id] = conn_nodes[0]
-            if not valid:
-                return
-            self.cancel_pending_task("ensure_nodes_connected")
-            print(f"[Node {self.node_id}] Starting")
-            self.register_anonymous_task("delayed_start", self.on_start, delay=self.on_start_delay)
-
-        self.register_task("ensure_nodes_connected", _ensure_nodes_connected, interval=0.5, delay=1)
+        for node_id, conn in connections:
+            ip_address = f"{host_network_base}.{node_id + 10}"
+            if use_localhost:
+                ip_address = host_network
+            self._neighbour_addresses[node_id] = (ip_address, conn)
+        # Neighbours that introduced themselves before we started are already known to the network
+        known_ports = {p.address[1]: p for p in self.get_peers()}
+        for node_id, conn in connections:
+            if conn in known_ports:
+                self.register_node(node_id, known_ports[conn])
+            else:
+                self._pending_ports[conn] = node_id
+        # Every neighbour needs a slot, ipv8 drops introductions beyond max_peers
+        self.max_peers = max(self.max_peers, 2 * len(connections))
+
+        if not self._pending_ports:
+            self._on_neighbours_connected()
+            return
+        self.register_task("connect_neighbours", self._connect_neighbours)
+        if self.connect_timeout is not None:
+            self.register_task("connect_timeout", self._on_connect_timeout, delay=self.connect_timeout)
+
+    async def _connect_neighbours(self) -> None:
+        # Only retry the neighbours that are still missing, backing off while they do not answer
+        interval = self.walk_interval
+        while self._pending_ports:
+            for node_id in list(self._pending_ports.values()):
+                self.walk_to(self._neighbour_addresses[node_id])
+            await sleep(interval)
+            interval = min(interval * self.walk_backoff, self.walk_max_interval)
+
+    def _on_connect_timeout(self) -> None:
+        self.tracer.status("Timed out waiting for neighbours: {}", self.missing_neighbours())
+        self.cancel_pending_task("connect_neighbours")
+        self.stop()
+
+    def missing_neighbours(self) -> List[int]:
+        return sorted(self._pending_ports.values())
+
+    def introduction_request_callback(self, peer: Peer, dist, payload) -> None:
+        self._on_peer_introduced(peer)
+
+    def introduction_response_callback(self, peer: Peer, dist, payload) -> None:
+        self._on_peer_introduced(peer)
+
+    def _on_peer_introduced(self, peer: Peer) -> None:
+        node_id = self._pending_ports.pop(peer.address[1], None)
+        if node_id is None:
+            return
+        self.register_node(node_id, peer)
+        if not self._pending_ports:
+            self._on_neighbours_connected()
+
+    def _on_neighbours_connected(self) -> None:
+        self.cancel_pending_task("connect_neighbours")
+        self.cancel_pending_task("connect_timeout")
+        # Keep the configured neighbour order, algorithms rely on it (e.g. the first neighbour in a ring)
+        self.nodes = {node_id: self.nodes[node_id] for node_id, _ in self.connections}
+        self._neighbour_items = None
+        self.ready.set()
+        self.tracer.start()
+        self.register_anonymous_task("delayed_start", self.on_start, delay=self.on_start_delay)
+        if self.fault is not None:
+            self.register_task("inject_fault", self.inject_fault, delay=self.on_start_delay + self.fault.after)
 
     def on_start(self):
         pass
 
     def stop(self, delay: int = 0):
         async def delayed_stop():
-            print(f"[Node {self.node_id}] Stopping algorithm")
+            self.tracer.stop()
+            self.flush_batches()
+            self.tracer.flush()
+            self.export_metrics()
             self.event.set()
 
         self.register_anonymous_task("delayed_stop", delayed_stop, delay=delay)
 
+    def inject_fault(self) -> None:
+        """
+        Turn this node faulty: from now on its sends go through the fault, a crashed node stops altogether.
+        """
+        self.tracer.status("Injecting fault: {}", self.fault.kind)
+        self.faulty = True
+        if self.fault.kind == CRASH:
+            self.crashed = True
+            for timer in self._flush_timers.values():
+                timer.cancel()
+            self._flush_timers.clear()
+            self._outbox.clear()
+            self.cancel_all_pending_tasks()
+            self.stop()
+        elif self.fault.kind == FORGE and self.fault.flood:
+            self.register_task("fault_flood", self.flood, self.fault.flood, self.fault.rate)
+
+    def corrupt(self, kind: str, node_id: Optional[int], payload: AnyPayload) -> AnyPayload:
+        """
+        The payload as a forging or tampering node sends it to node_id. Algorithms that can be attacked this way
+        override it, by default the payload is sent unchanged.
+        """
+        return payload
+
+    async def flood(self, count: int, rate: float) -> None:
+        """
+        Make up `count` messages at `rate` messages per second as a forging node. Does nothing by default.
+        """
+
+    def export_metrics(self) -> None:
+        self.metrics.observe_pending_tasks(len(self.get_tasks()))
+        self.metrics.trace_dropped = self.tracer.dropped
+        drops = [udp_drops(port) for port in self._socket_ports()]
+        if any(count is not None for count in drops):
+            self.metrics.socket_drops = sum(count or 0 for count in drops)
+        if self.metrics_file:
+            self.metrics.dump(self.metrics_file)
+
+    async def _start_metrics_server(self, port: int) -> None:
+        async def handle(_request: web.Request) -> web.Response:
+            self.metrics.observe_pending_tasks(len(self.get_tasks()))
+            return web.json_response(self.metrics.snapshot())
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        self._metrics_runner = web.AppRunner(app, access_log=None)
+        await self._metrics_runner.setup()
+        await web.TCPSite(self._metrics_runner, "localhost", port).start()
+
+    def dispatch(self, handler: LazyWrappedHandler, peer: Peer, payloads: List[AnyPayload], size: int):
+        """
+        Call a message handler with the unpacked payloads of a received message, or queue the call when the inbound
+        queue is used.
+        """
+        if self.crashed:
+            return None
+        node_id = self.node_id_from_peer(peer)
+        msg_type = type(payloads[-1]).__name__
+        self.metrics.on_receive(msg_type, node_id, size)
+        if self.tracer.packets:
+            self.tracer.receive(node_id, msg_type, size)
+        if self.inbound is None:
+            return self._handle(handler, peer, payloads, msg_type)
+        item = (handler, peer, payloads, msg_type, node_id, get_running_loop().time())
+        discarded = self.inbound.put(node_id, item)
+        if discarded:
+            self.metrics.on_overload(discarded)
+        self.metrics.observe_state("inbound_queue", self.inbound.depth)
+        return None
+
+    def _handle(self, handler: LazyWrappedHandler, peer: Peer, payloads: List[AnyPayload], msg_type: str):
+        started = time.perf_counter()
+        result = handler(self, peer, *payloads)
+        if iscoroutine(result):
+            return self.metrics.time_handler(msg_type, result)
+        self.metrics.observe_handler(msg_type, time.perf_counter() - started)
+        return result
+
+    def _start_queued(self, item: tuple) -> None:
+        self.register_anonymous_task("inbound", self._handle_queued, item)
+
+    async def _handle_queued(self, item: tuple) -> None:
+        handler, peer, payloads, msg_type, node_id, queued = item
+        self.metrics.queue_wait.observe(get_running_loop().time() - queued)
+        try:
+            result = self._handle(handler, peer, payloads, msg_type)
+            if iscoroutine(result):
+                await result
+        except Exception:
+            self.logger.exception("Exception occurred while handling queued message!\n%s",
+                                  "".join(format_exception(*sys.exc_info())))
+        # Not reached when cancelled on shutdown or crash, so no new handlers are started then
+        self.inbound.done(node_id)
+        self.metrics.observe_state("inbound_queue", self.inbound.depth)
+
+    def _endpoints(self) -> List:
+        return list(getattr(self.endpoint, "interfaces", {}).values() or (self.endpoint,))
+
+    def _socket_ports(self) -> List[int]:
+        # The local ports of the node's UDP sockets, none on a simulated network
+        transports = (getattr(endpoint, "_transport", None) for endpoint in self._endpoints())
+        names = (transport.get_extra_info("sockname") for transport in transports if transport is not None)
+        return [name[1] for name in names if name]
+
+    def _pause_receiving(self, paused: bool) -> None:
+        # Stop reading from the sockets. Datagrams then pile up in the socket's receive buffer, and once that is full
+        # the OS drops them (counted in metrics.socket_drops where the OS reports it)
+        self.tracer.status("Inbound queue full, pausing" if paused else "Inbound queue drained, resuming")
+        if paused:
+            self.metrics.on_overload("pause")
+        for endpoint in self._endpoints():
+            reader = getattr(endpoint, "_transport", None) or endpoint
+            method = getattr(reader, "pause_reading" if paused else "resume_reading", None)
+            if method is not None:
+                method()
+
+    def _on_send(self, peer: Peer, msg_type: str, size: int) -> None:
+        node_id = self.node_id_from_peer(peer)
+        self.metrics.on_send(msg_type, node_id, size)
+        if self.tracer.packets:
+            self.tracer.send(node_id, msg_type, size)
+
     def ez_send(self, peer: Peer, *payloads: AnyPayload, **kwargs) -> None:
-        super().ez_send(peer, *payloads, **kwargs)
+        if self.faulty:
+            self._send_faulty(peer, payloads, kwargs)
+        else:
+            self._send(peer, payloads, kwargs)
+
+    def _send_faulty(self, peer: Peer, payloads: Tuple[AnyPayload, ...], kwargs: dict) -> None:
+        fault = self.fault
+        if fault.kind == CRASH:
+            return
+        if self.fault_rng.random() >= fault.probability:
+            self._send(peer, payloads, kwargs)
+            return
+        node_id = self.node_id_from_peer(peer)
+        self.metrics.on_fault(fault.kind)
+        self.tracer.status("Injecting {} fault into {} to {}", fault.kind, type(payloads[-1]).__name__, node_id,
+                           level=DEBUG)
+        if fault.kind == SILENT:
+            return
+        if fault.kind == DELAY:
+            delay = fault.delay_model.sample((self.node_id, node_id))
+            self.register_anonymous_task("fault_delay", self._send, peer, payloads, kwargs, delay=delay)
+            return
+        self._send(peer, (*payloads[:-1], self.corrupt(fault.kind, node_id, payloads[-1])), kwargs)
+
+    def _send(self, peer: Peer, payloads: Tuple[AnyPayload, ...], kwargs: dict) -> None:
+        if not self.batching or not kwargs.get("sig", True):
+            packet = self.pack(peer, payloads[-1].msg_id, payloads, kwargs.get("sig", True))
+            self._on_send(peer, type(payloads[-1]).__name__, len(packet))
+            self.metrics.on_packet_sent(len(packet))
+            self.endpoint.send(peer.address, packet)
+            return
+        frame = bytes([payloads[-1].msg_id]) + self.serializer.pack_serializable_list(payloads)
+        self._on_send(peer, type(payloads[-1]).__name__, len(frame))
+        address = peer.address
+        _, frames, size = self._outbox.get(address, (peer, [], 0))
+        frames.append(frame)
+        self._outbox[address] = (peer, frames, size + len(frame))
+        if size + len(frame) >= self.batch_max_bytes or len(frames) >= 255:
+            self.flush_batch(address)
+        elif address not in self._flush_timers:
+            self._flush_timers[address] = get_running_loop().call_later(self.batch_delay, self.flush_batch, address)
+
+    def flush_batch(self, address: Address) -> None:
+        timer = self._flush_timers.pop(address, None)
+        if timer is not None:
+            timer.cancel()
+        peer, frames, _ = self._outbox.pop(address, (None, [], 0))
+        if frames:
+            packet = self.pack(peer, BATCH_MSG_ID, (Batch(frames),))
+            # The frames were counted as messages already, the batch only as a packet
+            self.metrics.on_packet_sent(len(packet))
+            self.endpoint.send(peer.address, packet)
+
+    def flush_batches(self) -> None:
+        for address in list(self._outbox):
+            self.flush_batch(address)
+
+    def on_batch(self, source_address: Address, data: bytes) -> None:
+        # Not a message_wrapper handler: the batch is a packet, not a message, only its frames are dispatched
+        if self.crashed:
+            return
+        peer, remainder = self.authenticate(source_address, data, (Batch,))
+        self.metrics.on_packet_received(len(data))
+        payload, = self.serializer.unpack_serializable_list((Batch,), remainder, offset=23)
+        # Dispatch every frame to the handler of its message id, as if it arrived in its own packet
+        for frame in payload.frames:
+            handler = self.decode_map[frame[0]]
+            if handler is None:
+                self.logger.warning("Received unknown message in batch: %d", frame[0])
+                continue
+            try:
+                result = handler(peer.address, frame, peer=peer)
+                if iscoroutine(result):
+                    self.register_anonymous_task("on_packet", ensure_future(result), ignore=(Exception,))
+            except Exception:
+                self.logger.exception("Exception occurred while handling batched message!\n%s",
+                                      "".join(format_exception(*sys.exc_info())))
+
+    async def unload(self) -> None:
+        for timer in self._flush_timers.values():
+            timer.cancel()
+        self.tracer.close()
+        if self._metrics_runner is not None:
+            await self._metrics_runner.cleanup()
+        await super().unload()
 
     def add_message_handler(self, msg_num: int | type[AnyPayload], callback: MessageHandlerFunction) -> None:
         super().add_message_handler(msg_num, callback)
@@ -0,0 +1,48 @@
+import random
+from typing import Dict, Hashable, Optional
+
+
+class DelayModel:
+    """
+    Samples artificial delays (in seconds) from a spec string.
+
+    Supported specs:
+        none                    no delay
+        constant:<d>            always d seconds
+        uniform:<lo>:<hi>       uniformly drawn from [lo, hi] on every sample
+        exponential:<mean>      exponentially distributed with the given mean
+        link:<lo>:<hi>          a fixed delay per link, drawn once from [lo, hi]
+    """
+
+    KINDS = ("none", "constant", "uniform", "exponential", "link")
+
+    def __init__(self, spec: str = "none", rng: Optional[random.Random] = None) -> None:
+        # Without an rng the global random module is used, so seeding it makes the delays reproducible
+        kind, *params = spec.split(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown delay model {spec!r}, expected one of {', '.join(self.KINDS)}")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        self.rng = rng or random
+        self._link_delays: Dict[Hashable, float] = {}
+
+    def __bool__(self) -> bool:
+        return self.kind != "none"
+
+    def __repr__(self) -> str:
+        return f"DelayModel({self.spec!r})"
+
+    def sample(self, link: Hashable = None) -> float:
+        if self.kind == "none":
+            return 0.0
+        if self.kind == "constant":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(*self.params)
+        if self.kind == "exponential":
+            return self.rng.expovariate(1.0 / self.params[0])
+        # Per-link latency: stable for the lifetime of the model
+        if link not in self._link_delays:
+            self._link_delays[link] = self.rng.uniform(*self.params)
+        return self._link_delays[link]
@@ -0,0 +1,110 @@
+"""
+Fault injection: nodes that crash, stay silent, delay, forge or tamper with the messages they send.
+
+The faulty nodes of a run are read from a YAML file, e.g.:
+
+    seed: 42
+    nodes:
+      3: crash                                  # shorthand for {kind: crash}
+      5: {kind: delay, delay: "uniform:0.5:2.0"}
+      6: {kind: forge, after: 2.0, flood: 100, rate: 20}
+    random:                                     # nodes picked with the seed, the same on every node
+      count: 1
+      kind: tamper
+      exclude: [0]
+
+Every node reads the same file and only looks up its own fault, so all nodes agree on who is faulty without
+exchanging anything. More faulty nodes than the algorithm's max_fault void its guarantees, which is warned about.
+"""
+import argparse
+import random
+import warnings
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+
+from delays import DelayModel
+
+CRASH = "crash"
+SILENT = "silent"
+DELAY = "delay"
+FORGE = "forge"
+TAMPER = "tamper"
+KINDS = (CRASH, SILENT, DELAY, FORGE, TAMPER)
+
+
+@dataclass
+class Fault:
+    """
+    crash:  stops sending, receiving and running its algorithm
+    silent: keeps running, but drops the messages it sends
+    delay:  holds every message it sends for a delay drawn from the `delay` model
+    forge:  alters the content of the messages it sends and floods `flood` broadcasts on behalf of other nodes
+    tamper: alters the paths (or other routing data) of the messages it sends
+    """
+
+    kind: str
+    after: float = 0.0
+    """Seconds after the algorithm started at which the node turns faulty."""
+
+    probability: float = 1.0
+    """Fraction of the sent messages that are dropped, delayed, forged or tampered with."""
+
+    delay: str = "uniform:1.0:3.0"
+    """Delay model of a delaying node."""
+
+    flood: int = 0
+    """Number of broadcasts a forging node makes up on behalf of other nodes."""
+
+    rate: float = 10.0
+    """Forged broadcasts per second."""
+
+    def __post_init__(self) -> None:
+        if self.kind not in KINDS:
+            raise ValueError(f"Unknown fault {self.kind!r}, expected one of {', '.join(KINDS)}")
+        self.delay_model = DelayModel(self.delay)
+
+
+def _fault(spec: Any) -> Fault:
+    return Fault(spec) if isinstance(spec, str) else Fault(**spec)
+
+
+def load_faults(path: str, node_count: int, max_fault: Optional[int] = None) -> Tuple[int, Dict[int, Fault]]:
+    """
+    The seed and the fault of every faulty node of a fault file, warning when there are more than max_fault.
+    """
+    with open(path, "r") as f:
+        config = yaml.safe_load(f) or {}
+    seed = config.get("seed", 0)
+    faults = {int(node_id): _fault(spec) for node_id, spec in (config.get("nodes") or {}).items()}
+    picked = config.get("random")
+    if picked:
+        spec = {key: value for key, value in picked.items() if key not in ("count", "exclude")}
+        excluded = set(faults) | set(picked.get("exclude", ()))
+        candidates = [node_id for node_id in range(node_count) if node_id not in excluded]
+        for node_id in random.Random(seed).sample(candidates, min(picked.get("count", 1), len(candidates))):
+            faults[node_id] = _fault(spec)
+    if max_fault is not None and len(faults) > max_fault:
+        warnings.warn(f"{path} makes {len(faults)} nodes faulty, but only max_fault={max_fault} are tolerated")
+    return seed, faults
+
+
+def load_fault(
+    path: str, node_id: int, node_count: int, max_fault: Optional[int] = None
+) -> Tuple[Optional[Fault], random.Random]:
+    """
+    The fault of a single node (None if it is correct) and a random generator seeded for that node.
+    """
+    seed, faults = load_faults(path, node_count, max_fault)
+    return faults.get(node_id), random.Random(f"{seed}:{node_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="Faults", description="Lists the faulty nodes of a fault file.")
+    parser.add_argument("config", type=str)
+    parser.add_argument("nodes", type=int, help="number of nodes in the topology")
+    parser.add_argument("-maxfault", type=int, default=None, help="warn when more nodes are faulty")
+    args = parser.parse_args()
+    for node_id, fault in sorted(load_faults(args.config, args.nodes, args.maxfault)[1].items()):
+        print(f"Node {node_id}: {fault}")
@@ -0,0 +1,113 @@
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Set
+
+FIFO = "fifo"
+UNORDERED = "unordered"
+ORDERS = (FIFO, UNORDERED)
+
+DROP = "drop"
+SHED = "shed"
+BACKPRESSURE = "backpressure"
+OVERLOADS = (DROP, SHED, BACKPRESSURE)
+
+
+class InboundQueue:
+    """
+    Bounded queue of received messages, handled by at most `workers` handlers at once.
+
+    With fifo ordering the messages of one sender are handled one at a time, in the order they arrived, while
+    messages of different senders are handled concurrently. Unordered hands every message to the next free worker.
+
+    When `capacity` messages are waiting, the overload policy decides: drop discards the new message, shed discards
+    the oldest waiting message of the sender with the most waiting messages, and backpressure calls pause(True) to
+    stop reading from the network until the queue is down to half its capacity (messages that still arrive while
+    paused are queued anyway). Over UDP that is not lossless: the OS buffers what arrives meanwhile and drops it when
+    the socket's receive buffer is full.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        workers: int,
+        order: str,
+        overload: str,
+        start: Callable[[Any], Any],
+        pause: Callable[[bool], None],
+    ) -> None:
+        if order not in ORDERS:
+            raise ValueError(f"Unknown inbound order {order!r}, expected one of {', '.join(ORDERS)}")
+        if overload not in OVERLOADS:
+            raise ValueError(f"Unknown overload policy {overload!r}, expected one of {', '.join(OVERLOADS)}")
+        self.capacity = capacity
+        self.workers = workers
+        self.order = order
+        self.overload = overload
+        # start(item) runs the handler of an item, and calls done(sender) when it has finished
+        self._start = start
+        self._pause = pause
+        self.paused = False
+        self.depth = 0
+        self.running = 0
+        # Sender (None for all senders if unordered) -> its waiting items, and the senders that may start one now
+        self._waiting: Dict[Optional[Hashable], Deque[Any]] = {}
+        self._ready: Deque[Optional[Hashable]] = deque()
+        self._busy: Set[Optional[Hashable]] = set()
+
+    def put(self, sender: Hashable, item: Any) -> Optional[str]:
+        """
+        Queue an item, return the overload policy if an item had to be discarded for it.
+        """
+        key = sender if self.order == FIFO else None
+        discarded = None
+        if self.depth >= self.capacity:
+            if self.overload == DROP:
+                return DROP
+            if self.overload == SHED:
+                heaviest = max(self._waiting, key=lambda k: len(self._waiting[k]))
+                self._pop(heaviest)
+                discarded = SHED
+            elif not self.paused:
+                self.paused = True
+                self._pause(True)
+        waiting = self._waiting.get(key)
+        if waiting is None:
+            waiting = self._waiting[key] = deque()
+            if key not in self._busy:
+                self._ready.append(key)
+        waiting.append(item)
+        self.depth += 1
+        self._schedule()
+        return discarded
+
+    def done(self, sender: Hashable) -> None:
+        key = sender if self.order == FIFO else None
+        self.running -= 1
+        self._busy.discard(key)
+        if key in self._waiting and key not in self._ready:
+            self._ready.append(key)
+        if self.paused and self.depth <= self.capacity // 2:
+            self.paused = False
+            self._pause(False)
+        self._schedule()
+
+    def _pop(self, key: Optional[Hashable]) -> Any:
+        waiting = self._waiting[key]
+        item = waiting.popleft()
+        if not waiting:
+            del self._waiting[key]
+            if key in self._ready:
+                self._ready.remove(key)
+        self.depth -= 1
+        return item
+
+    def _schedule(self) -> None:
+        while self.running < self.workers and self._ready:
+            key = self._ready[0]
+            item = self._pop(key)
+            if self.order == FIFO:
+                # The sender's next item waits until this one is done
+                if key in self._ready:
+                    self._ready.popleft()
+                self._busy.add(key)
+            self.running += 1
+            self._start(item)
@@ -0,0 +1,129 @@
+"""
+Key store: the private keys of all nodes in one text file, one base64 encoded key per line, line i for node i.
+
+Generating a "medium" key takes a few milliseconds and used to happen for every node on startup (ec{node_id}.pem),
+so the keys are generated once, e.g. `python src/keys.py 128`, and every node on the host reads its key from the
+same file. Nodes that find the store missing or too small add the missing keys themselves, under a lock on
+`<store>.lock`, so concurrent nodes never generate different keys for the same node.
+"""
+import argparse
+import os
+from base64 import b64encode
+from contextlib import contextmanager
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Iterator, Optional, Tuple
+
+import libnacl
+from cryptography.hazmat.primitives.asymmetric.ec import ECDH
+from ipv8.keyvault.crypto import default_eccrypto
+from ipv8.keyvault.private.libnaclkey import LibNaCLSK
+from ipv8.types import PrivateKey, PublicKey
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+CURVES = ("curve25519", "very-low", "low", "medium", "high")
+
+
+def default_path(curve: str) -> str:
+    return os.path.join("keys", f"{curve}.keys")
+
+
+@lru_cache(maxsize=None)
+def _read(path: str, _version: Tuple[int, int]) -> Tuple[str, ...]:
+    with open(path, "r") as f:
+        return tuple(line.strip() for line in f if line.strip())
+
+
+@contextmanager
+def _locked(path: str) -> Iterator[None]:
+    """
+    Hold an exclusive lock on a lock file, waiting until other processes release it.
+    """
+    with open(path, "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+            return
+        # Lock the first byte; LK_LOCK gives up after 10 seconds, so keep trying
+        lock.seek(0)
+        while True:
+            try:
+                msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                pass
+        try:
+            yield
+        finally:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _stored(path: str) -> Tuple[str, ...]:
+    if not os.path.exists(path):
+        return ()
+    # Size and mtime in nanoseconds, so a store rewritten within one coarse mtime tick is still read again
+    stat = os.stat(path)
+    return _read(path, (stat.st_mtime_ns, stat.st_size))
+
+
+def _generate(path: str, keys: Tuple[str, ...], count: int, curve: str) -> Tuple[str, ...]:
+    keys += tuple(b64encode(default_eccrypto.generate_key(curve).key_to_bin()).decode()
+                  for _ in range(count - len(keys)))
+    # Write to a temporary file first, so other processes never read a half-written store
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as f:
+        f.write("\n".join(keys) + "\n")
+    os.replace(temporary, path)
+    return keys
+
+
+def load_keys(count: int, curve: str = "medium", path: Optional[str] = None) -> Tuple[str, ...]:
+    """
+    The base64 encoded private keys of nodes 0..count - 1 (at least), generating and storing the missing ones.
+    The file is only read again when it has changed, so the nodes of one process share a single read.
+    """
+    if curve not in CURVES:
+        raise ValueError(f"Unknown curve {curve!r}, expected one of {', '.join(CURVES)}")
+    path = path or default_path(curve)
+    keys = _stored(path)
+    if len(keys) >= count:
+        return keys
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _locked(f"{path}.lock"):
+        # Another process may have added the keys while we waited for the lock
+        keys = _stored(path)
+        if len(keys) < count:
+            keys = _generate(path, keys, count, curve)
+    return keys
+
+
+def load_key(node_id: int, curve: str = "medium", path: Optional[str] = None) -> str:
+    return load_keys(node_id + 1, curve, path)[node_id]
+
+
+def link_key(private_key: PrivateKey, public_key: PublicKey) -> bytes:
+    """
+    The symmetric key of the link between the owners of two keys (Diffie-Hellman), both sides derive the same key.
+    """
+    if isinstance(private_key, LibNaCLSK):
+        secret = libnacl.crypto_box_beforenm(public_key.key.pk, private_key.key.sk)
+    else:
+        secret = private_key.ec.exchange(ECDH(), public_key.ec)
+    return blake2b(secret, digest_size=32, person=b"IN4150 link key").digest()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="Keys", description="Generates the key store of a number of nodes.")
+    parser.add_argument("nodes", type=int, help="number of nodes to generate keys for")
+    parser.add_argument("-curve", type=str, default="medium", choices=CURVES)
+    parser.add_argument("-out", type=str, default=None, help="key store file, defaults to keys/<curve>.keys")
+    args = parser.parse_args()
+    path = args.out or default_path(args.curve)
+    print(f"{len(load_keys(args.nodes, args.curve, path))} {args.curve} keys in {path}")
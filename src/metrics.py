@@ -0,0 +1,334 @@
+"""
+Per-node message counters and latency histograms, and an aggregator for the dumps of all nodes of a run.
+
+    python src/metrics.py metrics/*.json -out merged.json
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import time
+from typing import Any, Awaitable, Dict, Iterable, List, Optional
+
+# Histogram bucket i counts values below 2 ** i microseconds, the last bucket everything above
+BUCKETS = 32
+
+
+class Histogram:
+    """
+    Log2-bucketed histogram of durations in seconds: recording is a frexp and a list increment.
+    """
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        exponent = math.frexp(seconds * 1e6)[1] if seconds > 0 else 0
+        self.buckets[min(max(exponent, 0), BUCKETS - 1)] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "total": self.total, "max": self.max, "buckets": self.buckets}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Histogram":
+        histogram = cls()
+        histogram.count, histogram.total, histogram.max = data["count"], data["total"], data["max"]
+        histogram.buckets = list(data["buckets"])
+        return histogram
+
+    def merge(self, other: "Histogram") -> None:
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound (in seconds) of the bucket holding the q-quantile.
+        """
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(2 ** i / 1e6, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class Metrics:
+    """
+    Message counters per message type and neighbour, packet counters, handler time per message type, the delivery
+    latency of the algorithm, the number of pending tasks, the injected faults, the size of the algorithm's state and
+    the inbound queue of one node.
+    """
+
+    def __init__(self, node_id: Optional[int] = None) -> None:
+        self.node_id = node_id
+        # Message type -> neighbour -> [messages, bytes], a message in a Batch counts with the size of its frame
+        self.sent: Dict[str, Dict[Optional[int], List[int]]] = {}
+        self.received: Dict[str, Dict[Optional[int], List[int]]] = {}
+        # [packets, bytes] on the wire, a Batch packet is a single packet however many messages it carries
+        self.packets_sent = [0, 0]
+        self.packets_received = [0, 0]
+        self.handler_time: Dict[str, Histogram] = {}
+        self.deliver_latency = Histogram()
+        self.pending_tasks = 0
+        self.max_pending_tasks = 0
+        # Fault kind -> messages affected, see faults.py
+        self.faults: Dict[str, int] = {}
+        # Gauges of the algorithm's state, e.g. the number of undelivered broadcasts, and their peaks
+        self.state: Dict[str, int] = {}
+        self.max_state: Dict[str, int] = {}
+        # Time received messages wait in the inbound queue, and the messages discarded or pauses due to overload
+        self.queue_wait = Histogram()
+        self.overload: Dict[str, int] = {}
+        # Trace events overwritten in the tracer's ring buffer before they were written
+        self.trace_dropped = 0
+        # Datagrams the OS dropped as the receive buffer of the node's socket was full, see udp_drops
+        self.socket_drops = 0
+
+    @staticmethod
+    def _count(counters: Dict[str, Dict[Optional[int], List[int]]], msg_type: str, peer: Optional[int], size: int):
+        per_peer = counters.get(msg_type)
+        if per_peer is None:
+            per_peer = counters[msg_type] = {}
+        counter = per_peer.get(peer)
+        if counter is None:
+            per_peer[peer] = [1, size]
+        else:
+            counter[0] += 1
+            counter[1] += size
+
+    def on_send(self, msg_type: str, peer: Optional[int], size: int) -> None:
+        self._count(self.sent, msg_type, peer, size)
+
+    def on_receive(self, msg_type: str, peer: Optional[int], size: int) -> None:
+        self._count(self.received, msg_type, peer, size)
+
+    def on_packet_sent(self, size: int) -> None:
+        self.packets_sent[0] += 1
+        self.packets_sent[1] += size
+
+    def on_packet_received(self, size: int) -> None:
+        self.packets_received[0] += 1
+        self.packets_received[1] += size
+
+    def sent_messages(self) -> int:
+        return sum(count for per_peer in self.sent.values() for count, _ in per_peer.values())
+
+    def observe_handler(self, msg_type: str, seconds: float) -> None:
+        histogram = self.handler_time.get(msg_type)
+        if histogram is None:
+            histogram = self.handler_time[msg_type] = Histogram()
+        histogram.observe(seconds)
+
+    async def time_handler(self, msg_type: str, coroutine: Awaitable) -> Any:
+        # Includes the time the handler spends waiting, e.g. for a free send slot
+        started = time.perf_counter()
+        try:
+            return await coroutine
+        finally:
+            self.observe_handler(msg_type, time.perf_counter() - started)
+
+    def observe_pending_tasks(self, count: int) -> None:
+        self.pending_tasks = count
+        self.max_pending_tasks = max(self.max_pending_tasks, count)
+
+    def on_fault(self, kind: str) -> None:
+        self.faults[kind] = self.faults.get(kind, 0) + 1
+
+    def on_overload(self, policy: str) -> None:
+        self.overload[policy] = self.overload.get(policy, 0) + 1
+
+    def observe_state(self, name: str, value: int) -> None:
+        self.state[name] = value
+        if value > self.max_state.get(name, 0):
+            self.max_state[name] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        def counters(per_type):
+            return {t: {str(p): c for p, c in per_peer.items()} for t, per_peer in per_type.items()}
+
+        return {
+            "node": self.node_id,
+            "time": time.time(),
+            "sent": counters(self.sent),
+            "received": counters(self.received),
+            "packets": {"sent": self.packets_sent, "received": self.packets_received},
+            "handler_time": {t: h.to_dict() for t, h in self.handler_time.items()},
+            "deliver_latency": self.deliver_latency.to_dict(),
+            "pending_tasks": self.pending_tasks,
+            "max_pending_tasks": self.max_pending_tasks,
+            "faults": self.faults,
+            "state": self.state,
+            "max_state": self.max_state,
+            "queue_wait": self.queue_wait.to_dict(),
+            "overload": self.overload,
+            "trace_dropped": self.trace_dropped,
+            "socket_drops": self.socket_drops,
+        }
+
+    def dump(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write and rename, so a reader never sees a partial dump
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + ".tmp", path)
+
+
+def merge(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge the dumps of all nodes: per message type totals, packet totals, per directed link totals
+    ("sender->receiver", as counted by the sender), handler time, delivery latency and queue wait histograms, injected
+    faults, overload counts, dropped trace events and datagrams and the peak state summed over all nodes.
+    """
+    per_type: Dict[str, Dict[str, int]] = {}
+    packets = {"sent": 0, "sent_bytes": 0, "received": 0, "received_bytes": 0}
+    links: Dict[str, List[int]] = {}
+    handler_time: Dict[str, Histogram] = {}
+    deliver_latency = Histogram()
+    max_pending = {}
+    faults: Dict[str, int] = {}
+    max_state: Dict[str, int] = {}
+    queue_wait = Histogram()
+    overload: Dict[str, int] = {}
+    trace_dropped = 0
+    socket_drops = 0
+    for snapshot in snapshots:
+        node = snapshot["node"]
+        for direction, (count, size) in snapshot.get("packets", {}).items():
+            packets[direction] += count
+            packets[f"{direction}_bytes"] += size
+        trace_dropped += snapshot.get("trace_dropped", 0)
+        socket_drops += snapshot.get("socket_drops", 0)
+        for direction in ("sent", "received"):
+            for msg_type, per_peer in snapshot[direction].items():
+                totals = per_type.setdefault(msg_type, {"sent": 0, "sent_bytes": 0, "received": 0, "received_bytes": 0})
+                for peer, (count, size) in per_peer.items():
+                    totals[direction] += count
+                    totals[f"{direction}_bytes"] += size
+                    if direction == "sent":
+                        link = links.setdefault(f"{node}->{peer}", [0, 0])
+                        link[0] += count
+                        link[1] += size
+        for msg_type, data in snapshot["handler_time"].items():
+            handler_time.setdefault(msg_type, Histogram()).merge(Histogram.from_dict(data))
+        deliver_latency.merge(Histogram.from_dict(snapshot["deliver_latency"]))
+        max_pending[str(node)] = snapshot["max_pending_tasks"]
+        for kind, count in snapshot.get("faults", {}).items():
+            faults[kind] = faults.get(kind, 0) + count
+        for name, value in snapshot.get("max_state", {}).items():
+            max_state[name] = max_state.get(name, 0) + value
+        if "queue_wait" in snapshot:
+            queue_wait.merge(Histogram.from_dict(snapshot["queue_wait"]))
+        for policy, count in snapshot.get("overload", {}).items():
+            overload[policy] = overload.get(policy, 0) + count
+
+    def summary(histogram: Histogram) -> Dict[str, Any]:
+        return {**histogram.to_dict(), "mean": histogram.mean, "p50": histogram.quantile(0.5),
+                "p99": histogram.quantile(0.99)}
+
+    return {
+        "nodes": len(max_pending),
+        "per_type": per_type,
+        "messages": {key: sum(totals[key] for totals in per_type.values()) for key in packets},
+        "packets": packets,
+        "links": dict(sorted(links.items(), key=lambda item: -item[1][1])),
+        "handler_time": {t: summary(h) for t, h in handler_time.items()},
+        "deliver_latency": summary(deliver_latency),
+        "max_pending_tasks": max_pending,
+        "faults": faults,
+        "max_state": max_state,
+        "queue_wait": summary(queue_wait),
+        "overload": overload,
+        "trace_dropped": trace_dropped,
+        "socket_drops": socket_drops,
+    }
+
+
+def udp_drops(port: int) -> Optional[int]:
+    """
+    The datagrams the OS dropped for the UDP socket bound to a local port since it was opened, mostly because its
+    receive buffer was full. Read from /proc/net/udp, so None where that is not available (other than Linux).
+    """
+    drops = None
+    for table in ("/proc/net/udp", "/proc/net/udp6"):
+        try:
+            with open(table, "r") as f:
+                lines = f.readlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            fields = line.split()
+            # local_address is ip:port in hex, the last column counts the drops
+            if int(fields[1].rsplit(":", 1)[1], 16) == port:
+                drops = (drops or 0) + int(fields[-1])
+    return drops
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="Metrics aggregator", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("dumps", type=str, nargs="+", help="metrics dumps of the nodes, e.g. metrics/*.json")
+    parser.add_argument("-out", type=str, default=None, help="write the merged metrics to this JSON file")
+    parser.add_argument("-top", type=int, default=10, help="number of hottest links to print")
+    args = parser.parse_args()
+
+    paths = [path for pattern in args.dumps for path in sorted(glob.glob(pattern)) or [pattern]]
+    snapshots = []
+    for path in paths:
+        with open(path, "r") as f:
+            snapshots.append(json.load(f))
+    merged = merge(snapshots)
+
+    print(f"{merged['nodes']} nodes")
+    print(f"{'type':>16} {'sent':>9} {'sent B':>11} {'recv':>9} {'recv B':>11} {'handler p50':>12} {'p99':>10}")
+    for msg_type, totals in sorted(merged["per_type"].items()):
+        handler = merged["handler_time"].get(msg_type)
+        p50, p99 = (f"{handler['p50'] * 1e3:.3f}ms", f"{handler['p99'] * 1e3:.3f}ms") if handler else ("-", "-")
+        print(f"{msg_type:>16} {totals['sent']:>9} {totals['sent_bytes']:>11} {totals['received']:>9} "
+              f"{totals['received_bytes']:>11} {p50:>12} {p99:>10}")
+    packets = merged["packets"]
+    print(f"{'packets':>16} {packets['sent']:>9} {packets['sent_bytes']:>11} {packets['received']:>9} "
+          f"{packets['received_bytes']:>11}")
+    latency = merged["deliver_latency"]
+    if latency["count"]:
+        print(f"Deliver latency: {latency['count']} deliveries, mean {latency['mean'] * 1e3:.3f}ms, "
+              f"p99 {latency['p99'] * 1e3:.3f}ms, max {latency['max'] * 1e3:.3f}ms")
+    wait = merged["queue_wait"]
+    if wait["count"]:
+        print(f"Inbound queue wait: {wait['count']} messages, mean {wait['mean'] * 1e3:.3f}ms, "
+              f"p99 {wait['p99'] * 1e3:.3f}ms, max {wait['max'] * 1e3:.3f}ms")
+    if merged["overload"]:
+        print("Overload: " + ", ".join(f"{policy} {count}" for policy, count in sorted(merged["overload"].items())))
+    if merged["faults"]:
+        print("Injected faults: " + ", ".join(f"{kind} {count}" for kind, count in sorted(merged["faults"].items())))
+    if merged["max_state"]:
+        print("Peak state (sum over nodes): " + ", ".join(f"{name} {value}" for name, value in
+                                                         sorted(merged["max_state"].items())))
+    if merged["trace_dropped"]:
+        print(f"Warning: {merged['trace_dropped']} trace events were dropped, raise trace_capacity")
+    if merged["socket_drops"]:
+        print(f"Warning: the OS dropped {merged['socket_drops']} received datagrams, the receive buffers were full")
+    print("Hottest links (sender->receiver: messages, bytes):")
+    for link, (count, size) in list(merged["links"].items())[:args.top]:
+        print(f"  {link}: {count}, {size}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(merged, f, indent=2)
+        print(f"Merged metrics written to {args.out}")
@@ -1,61 +1,217 @@
 import argparse
-import yaml
-from asyncio import run
+from asyncio import CancelledError, Event, FIRST_COMPLETED, ensure_future, gather, run, wait
+from contextlib import suppress
+from typing import Dict, List, Optional, Sequence
 from ipv8.configuration import ConfigBuilder, default_bootstrap_defs
 from ipv8.util import create_event_with_signals
 from ipv8_service import IPv8
 from algorithms import *
+from keys import CURVES, load_key, load_keys
+from simulation import SimulatedNetwork, run_simulation
+from topology import load_neighbours, load_topology, topology_size
+
+BASE_PORT = 9090
 
 
 def get_algorithm(name: str) -> DistributedAlgorithm:
     algorithms = {
         "echo": EchoAlgorithm,
         "election": RingElection,
+        "hs_election": HirschbergSinclair,
+        "wave_election": WaveElection,
         "dolev": DolevProtocol,
+        "bracha": BrachaProtocol,
     }
     if name not in algorithms.keys():
         raise Exception(f"Cannot find select algorithm with name {name}")
     return algorithms[name]
 
 
-async def start_communities(node_id, connections, algorithm, use_localhost=True) -> None:
-    event = create_event_with_signals()
-    base_port = 9090
+def node_id_type(value: str):
+    # "all" runs every node of the topology inside this process
+    return value if value == "all" else int(value)
+
+
+def build_configuration(
+    node_id: int,
+    connections: List[int],
+    event: Event,
+    use_localhost: bool = True,
+    settings: Optional[dict] = None,
+    key: Optional[str] = None,
+    base_port: int = BASE_PORT,
+) -> dict:
     connections_updated = [(x, base_port + x) for x in connections]
     node_port = base_port + node_id
     builder = ConfigBuilder().clear_keys().clear_overlays()
-    builder.add_key("my peer", "medium", f"ec{node_id}.pem")
+    # The key comes from the key store, the empty file path keeps ipv8 from writing it to a file of its own
+    builder.add_key_from_bin("my peer", key or load_key(node_id), "")
     builder.set_port(node_port)
     builder.add_overlay(
         "DA_Alg_Test",
         "my peer",
         [],
         default_bootstrap_defs,
-        {},
+        settings or {},
         [("started", node_id, connections_updated, event, use_localhost)],
     )
-    ipv8_instance = IPv8(builder.finalize(), extra_communities={"DA_Alg_Test": algorithm})
+    return builder.finalize()
+
+
+async def start_communities(
+    node_id, connections, algorithm, use_localhost=True, settings=None, key=None, base_port: int = BASE_PORT
+) -> None:
+    event = create_event_with_signals()
+    ipv8_instance = IPv8(
+        build_configuration(node_id, connections, event, use_localhost, settings, key, base_port),
+        extra_communities={"DA_Alg_Test": algorithm},
+    )
     await ipv8_instance.start()
     await event.wait()
     await ipv8_instance.stop()
 
 
+async def start_all_communities(
+    topology: Dict[int, List[int]],
+    algorithm,
+    network: Optional[SimulatedNetwork] = None,
+    settings=None,
+    keys: Optional[Sequence[str]] = None,
+    base_port: int = BASE_PORT,
+) -> None:
+    """
+    Run every node of the topology in the current event loop, each with its own IPv8 instance and UDP port.
+    When a SimulatedNetwork is given, nodes talk through its in-memory endpoints instead of UDP sockets.
+    Returns once all nodes have stopped (or on SIGINT/SIGTERM).
+    """
+    interrupted = create_event_with_signals()
+    events = {node_id: Event() for node_id in topology}
+    keys = keys or load_keys(max(topology) + 1)
+    instances = [
+        IPv8(
+            build_configuration(
+                node_id, connections, events[node_id], settings=settings, key=keys[node_id], base_port=base_port
+            ),
+            endpoint_override=network.create_endpoint(base_port + node_id) if network else None,
+            extra_communities={"DA_Alg_Test": algorithm},
+        )
+        for node_id, connections in topology.items()
+    ]
+    await gather(*(instance.start() for instance in instances))
+    print(f"Started {len(instances)} nodes in-process")
+
+    all_stopped = ensure_future(gather(*(event.wait() for event in events.values())))
+    interrupt = ensure_future(interrupted.wait())
+    await wait([all_stopped, interrupt], return_when=FIRST_COMPLETED)
+    for future in (all_stopped, interrupt):
+        future.cancel()
+        with suppress(CancelledError):
+            await future
+
+    await gather(*(instance.stop() for instance in instances))
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         prog="Distributed Algorithms",
         description="Code to execute distributed algorithms.",
         epilog="written by Bart Cox (2023)",
     )
-    parser.add_argument("node_id", type=int)
+    parser.add_argument("node_id", type=node_id_type, help='id of the node to run, or "all" to run every node in-process')
     parser.add_argument("topology", type=str, nargs="?", default="topologies/default.yaml")
     parser.add_argument("algorithm", type=str, nargs="?", default="echo")
     parser.add_argument("-docker", action="store_true")
+    parser.add_argument("-baseport", type=int, default=BASE_PORT, help="UDP port of node 0, node i uses baseport + i")
+    parser.add_argument("-simulate", action="store_true", help="run all nodes on an in-memory network in virtual time")
+    parser.add_argument("-seed", type=int, default=None, help="random seed of a simulated run")
+    parser.add_argument("-latency", type=str, default="constant:0.001", help="link latency model of a simulated run")
+    parser.add_argument("-nojitter", action="store_true", help="start the algorithm as soon as all neighbours are up")
+    parser.add_argument("-timeout", type=float, default=None, help="seconds to wait for neighbours before giving up")
+    parser.add_argument("-config", type=str, default=None, help="broadcast schedule of the dolev algorithm")
+    parser.add_argument("-delay", type=str, default=None, help="artificial delay model of dolev sends, e.g. none")
+    parser.add_argument("-maxfault", type=int, default=None, help="number of Byzantine nodes dolev tolerates")
+    parser.add_argument("-md", type=str, default=None, help='enabled dolev optimisations, e.g. 125 or "none"')
+    parser.add_argument("-inject", type=str, default=None, help="fault injection file, see faults.py")
+    parser.add_argument("-stopafter", type=int, default=None, help="stop dolev after this many deliveries")
+    parser.add_argument("-queue", type=int, default=None, help="inbound queue bound, 0 handles messages directly")
+    parser.add_argument("-workers", type=int, default=None, help="handlers of queued messages running at once")
+    parser.add_argument("-order", type=str, default=None, choices=("fifo", "unordered"), help="inbound queue order")
+    parser.add_argument("-overload", type=str, default=None, choices=("drop", "shed", "backpressure"),
+                        help="what to do when the inbound queue is full")
+    parser.add_argument("-auth", type=str, default=None, choices=("signature", "mac", "none"),
+                        help="sign every packet, MAC it with a per-link key, or trust the source address")
+    parser.add_argument("-curve", type=str, default="medium", choices=CURVES, help="key type of the nodes")
+    parser.add_argument("-keys", type=str, default=None, help="key store file, defaults to keys/<curve>.keys")
+    parser.add_argument("-batch", action="store_true", help="coalesce messages to the same neighbour into batches")
+    parser.add_argument("-trace", type=str, default=None, help="JSONL trace file per node, e.g. traces/{node_id}.jsonl")
+    parser.add_argument("-tracelevel", type=str, default=None, choices=("debug", "info", "off"))
+    parser.add_argument("-quiet", action="store_true", help="do not print events to the console")
+    parser.add_argument("-metrics", type=str, default=None, help="metrics dump per node, e.g. metrics/{node_id}.json")
+    parser.add_argument("-metricsinterval", type=float, default=None, help="seconds between two metrics dumps")
+    parser.add_argument("-metricsport", type=int, default=None, help="serve metrics over HTTP from this port + id")
     args = parser.parse_args()
     node_id = args.node_id
 
+    settings = {}
+    if args.nojitter:
+        settings["start_jitter"] = None
+    if args.timeout is not None:
+        settings["connect_timeout"] = args.timeout
+    if args.config is not None:
+        settings["broadcast_config"] = args.config
+    if args.maxfault is not None:
+        settings["max_fault"] = args.maxfault
+    if args.md is not None:
+        settings["md"] = args.md
+    if args.inject is not None:
+        settings["fault_config"] = args.inject
+    if args.stopafter is not None:
+        settings["stop_after"] = args.stopafter
+    if args.queue is not None:
+        settings["inbound_queue"] = args.queue
+    if args.workers is not None:
+        settings["inbound_workers"] = args.workers
+    if args.order is not None:
+        settings["inbound_order"] = args.order
+    if args.overload is not None:
+        settings["inbound_overload"] = args.overload
+    if args.auth is not None:
+        settings["auth"] = args.auth
+    if args.batch:
+        settings["batching"] = True
+    if args.delay is not None:
+        settings["send_delay"] = args.delay
+    if args.trace:
+        settings["trace_file"] = args.trace
+    if args.tracelevel:
+        settings["trace_level"] = args.tracelevel
+    if args.quiet:
+        settings["trace_console"] = False
+    if args.metrics:
+        settings["metrics_file"] = args.metrics
+    if args.metricsinterval:
+        settings["metrics_interval"] = args.metricsinterval
+    if args.metricsport:
+        settings["metrics_port"] = args.metricsport
+
     alg = get_algorithm(args.algorithm)
-    with open(args.topology, "r") as f:
-        topology = yaml.safe_load(f)
-        connections = topology[node_id]
+    settings["node_count"] = topology_size(args.topology)
 
-        run(start_communities(node_id, connections, alg, not args.docker))
+    if args.simulate:
+        if node_id != "all":
+            parser.error('-simulate requires node_id "all"')
+        network = SimulatedNetwork(args.latency, args.seed)
+        keys = load_keys(settings["node_count"], args.curve, args.keys)
+        run_simulation(
+            start_all_communities(load_topology(args.topology), alg, network, settings, keys, args.baseport), args.seed
+        )
+        print(f"Simulated {network.packets_sent} packets ({network.bytes_sent} bytes)")
+    elif node_id == "all":
+        keys = load_keys(settings["node_count"], args.curve, args.keys)
+        topology = load_topology(args.topology)
+        run(start_all_communities(topology, alg, settings=settings, keys=keys, base_port=args.baseport))
+    else:
+        # Binary topologies are memory-mapped, only this node's neighbours are read
+        connections = load_neighbours(args.topology, node_id)
+        key = load_key(node_id, args.curve, args.keys)
+        run(start_communities(node_id, connections, alg, not args.docker, settings, key, args.baseport))
@@ -0,0 +1,67 @@
+from functools import lru_cache
+from struct import Struct
+from typing import Iterable, List
+
+from ipv8.messaging.payload_dataclass import type_from_format
+from ipv8.messaging.serialization import Packer, PackError, Serializer
+
+NODE_PATH = "node-path"
+# Use as a dataclass field type to (de)serialize a tuple of node ids, e.g. ``path: NodePath = ()``
+NodePath = type_from_format(NODE_PATH)
+
+MAX_PATH_LENGTH = 255
+
+_WIDTH_CODES = {1: "B", 2: "H", 4: "I"}
+
+
+@lru_cache(maxsize=None)
+def _array_struct(length: int, width: int) -> Struct:
+    return Struct(f">{length}{_WIDTH_CODES[width]}")
+
+
+class NodeIdArray(Packer):
+    """
+    A list of non-negative node ids: one byte with the number of ids, one byte with the width of every id (1, 2 or
+    4 bytes, the smallest that fits the largest id) and then the ids as a fixed-width big-endian array.
+    Packing and unpacking is a single struct call, lists longer than max_length are refused in both directions.
+    """
+
+    def __init__(self, max_length: int = MAX_PATH_LENGTH) -> None:
+        self.max_length = min(max_length, 255)
+
+    def pack(self, data: Iterable[int]) -> bytes:
+        data = tuple(data)
+        if len(data) > self.max_length:
+            raise PackError(f"Path of {len(data)} node ids exceeds the maximum of {self.max_length}")
+        if not data:
+            return b"\x00\x01"
+        largest = max(data)
+        width = 1 if largest < 0x100 else 2 if largest < 0x10000 else 4
+        array = _array_struct(len(data), width)
+        out = bytearray(2 + array.size)
+        out[0] = len(data)
+        out[1] = width
+        try:
+            array.pack_into(out, 2, *data)
+        except Exception as e:
+            raise PackError(f"Cannot pack node ids {data}") from e
+        return bytes(out)
+
+    def unpack(self, data: bytes, offset: int, unpack_list: List, *args) -> int:
+        if len(data) < offset + 2:
+            raise PackError("Truncated node id array header")
+        length, width = data[offset], data[offset + 1]
+        if length > self.max_length:
+            raise PackError(f"Path of {length} node ids exceeds the maximum of {self.max_length}")
+        if width not in _WIDTH_CODES:
+            raise PackError(f"Invalid node id width {width}")
+        array = _array_struct(length, width)
+        if len(data) < offset + 2 + array.size:
+            raise PackError("Truncated node id array")
+        unpack_list.append(array.unpack_from(data, offset + 2))
+        return offset + 2 + array.size
+
+
+def register_formats(serializer: Serializer) -> Serializer:
+    serializer.add_packer(NODE_PATH, NodeIdArray())
+    return serializer
@@ -0,0 +1,150 @@
+import asyncio
+import random
+from asyncio import get_running_loop
+from typing import Dict, List, Optional, Tuple
+
+from ipv8.messaging.interfaces.endpoint import Endpoint
+from ipv8.messaging.interfaces.udp.endpoint import UDPv4Address
+from ipv8.types import Address
+
+from delays import DelayModel
+
+
+class _VirtualTimeSelector:
+    """
+    Wraps the loop's selector: instead of blocking until the next timer is due, jump the virtual clock forward.
+    Real file descriptors (e.g. the loop's self-pipe used for signals and executors) are still polled.
+    """
+
+    def __init__(self, selector, loop: "VirtualClockEventLoop") -> None:
+        self._selector = selector
+        self._loop = loop
+
+    def select(self, timeout: Optional[float] = None):
+        if timeout is None:
+            # Nothing scheduled at all, only an outside event (signal) can wake us up
+            return self._selector.select(None)
+        if timeout > 0:
+            self._loop.advance(timeout)
+        return self._selector.select(0)
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualClockEventLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop with a discrete-event virtual clock: ``asyncio.sleep`` and ``call_later`` complete as soon as
+    nothing else is runnable, so simulated delays cost no wall-clock time.
+    """
+
+    virtual_time = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._virtual_time = 0.0
+        self._selector = _VirtualTimeSelector(self._selector, self)
+
+    def time(self) -> float:
+        return self._virtual_time
+
+    def advance(self, seconds: float) -> None:
+        self._virtual_time += seconds
+
+
+class SimulatedEndpoint(Endpoint):
+    """
+    Endpoint that delivers packets to other endpoints of the same SimulatedNetwork in memory.
+    All endpoints live on one virtual host, so packets are routed by port.
+    """
+
+    def __init__(self, network: "SimulatedNetwork", port: int) -> None:
+        super().__init__()
+        self.network = network
+        self.address = UDPv4Address("127.0.0.1", port)
+        self._open = False
+        # Packets received while reading is paused (backpressure), delivered on resume
+        self._paused: Optional[List[Tuple[Address, bytes]]] = None
+
+    def pause_reading(self) -> None:
+        if self._paused is None:
+            self._paused = []
+
+    def resume_reading(self) -> None:
+        paused, self._paused = self._paused, None
+        for packet in paused or ():
+            self.receive(packet)
+
+    def receive(self, packet: Tuple[Address, bytes]) -> None:
+        if self._paused is not None:
+            self._paused.append(packet)
+        elif self._open:
+            self.notify_listeners(packet)
+
+    def assert_open(self) -> None:
+        assert self._open
+
+    def is_open(self) -> bool:
+        return self._open
+
+    def get_address(self) -> Address:
+        return self.address
+
+    def send(self, socket_address: Address, packet: bytes) -> None:
+        if self._open:
+            self.network.deliver(self, socket_address, packet)
+
+    async def open(self) -> bool:
+        self._open = True
+        return True
+
+    def close(self, timeout: float = 0.0) -> None:
+        self._open = False
+
+    def reset_byte_counters(self) -> None:
+        pass
+
+
+class SimulatedNetwork:
+    """
+    In-memory transport between SimulatedEndpoints with a configurable latency model.
+    Every packet is delivered after ``latency.sample((src_port, dst_port))`` seconds of (virtual) time.
+    """
+
+    def __init__(self, latency: str = "constant:0.001", seed: Optional[int] = None) -> None:
+        self.rng = random.Random(seed)
+        self.latency = DelayModel(latency, self.rng)
+        self.endpoints: Dict[int, SimulatedEndpoint] = {}
+        self.packets_sent = 0
+        self.bytes_sent = 0
+        self.packets_dropped = 0
+
+    def create_endpoint(self, port: int) -> SimulatedEndpoint:
+        endpoint = SimulatedEndpoint(self, port)
+        self.endpoints[port] = endpoint
+        return endpoint
+
+    def deliver(self, source: SimulatedEndpoint, address: Address, packet: bytes) -> None:
+        target = self.endpoints.get(address[1])
+        if target is None:
+            self.packets_dropped += 1
+            return
+        self.packets_sent += 1
+        self.bytes_sent += len(packet)
+        delay = self.latency.sample((source.address[1], address[1]))
+        get_running_loop().call_later(delay, target.receive, (source.address, packet))
+
+
+def run_simulation(main, seed: Optional[int] = None):
+    """
+    Run a coroutine to completion on a fresh VirtualClockEventLoop, seeding the global random module so the
+    algorithms' own randomness is reproducible as well.
+    """
+    random.seed(seed)
+    loop = VirtualClockEventLoop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(main)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
@@ -0,0 +1,245 @@
+"""
+Runs a grid of benchmark configurations in parallel and collects the results into one table.
+
+The grid is the product of the algorithms, node counts, degrees (num_connections), max_fault values, topology models,
+seeds and Dolev delay models, e.g.:
+
+    python src/sweep.py -algorithms dolev bracha -sizes 8 16 32 -degrees 5 7 -faults 1 2 -seeds 0 1 2 \\
+        -delays none "uniform:0.0:0.1" -workers 8
+
+Every run is a benchmark.py run (see there for the modes and what is measured) on a topology generated with
+topo_generator. Independent runs are spread over a pool of `-workers` processes, each pool worker gets its own range
+of UDP ports, so runs never share ports. In process mode every run starts a process per node, so by default there are
+only as many workers as runs of the largest topology fit on the CPU cores. Every run is appended to the results file
+right away with its status: ok (all nodes started and stopped and, without injected faults, every broadcast was
+delivered everywhere), skipped (e.g. a topology that does not tolerate max_fault), incomplete or error. Running the
+same sweep again skips the ok and skipped configurations, so an interrupted sweep resumes where it stopped and retries
+the failed runs.
+"""
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from benchmark import BASE_PORT, FIXED_TOPOLOGIES, MODES, configurations, fmt, run_benchmark, version
+from keys import load_keys
+from topo_generator import MODELS
+
+# Options that change the outcome of a run, part of its key besides the configuration itself
+KEY_OPTIONS = ("mode", "auth", "curve", "batch", "broadcasts", "descending")
+
+# Statuses of the runs that are not repeated on resume
+FINISHED = ("ok", "skipped")
+
+# Header, result field and format of the columns of the results table
+COLUMNS = (
+    ("algorithm", "algorithm", ""),
+    ("n", "nodes", ""),
+    ("k", "degree", ""),
+    ("f", "max_fault", ""),
+    ("model", "model", ""),
+    ("seed", "seed", ""),
+    ("delay", "delay", ""),
+    ("md", "md", ""),
+    ("inject", "inject", ""),
+    ("msgs", "messages", ""),
+    ("packets", "packets", ""),
+    ("bytes", "bytes", ""),
+    ("deliveries", "deliveries", ""),
+    ("first", "first_delivery", ".3f"),
+    ("last", "last", ".3f"),
+    ("wall", "wall", ".1f"),
+    ("cpu max", "cpu_max", ".2f"),
+    ("rss MiB", "rss_max_mib", ".1f"),
+    ("status", "status", ""),
+    ("skipped", "skipped", ""),
+)
+
+# Index of the port range of this pool worker, set when the worker starts
+_slot: Optional[int] = None
+
+
+def grid(args: argparse.Namespace) -> Iterable[dict]:
+    """
+    The configurations of the sweep. Models only vary for the algorithms that run on a random graph, delay models
+    only for Dolev and Bracha.
+    """
+    for config in configurations(args.algorithms, args.sizes, args.degrees, args.faults, args.md, args.inject):
+        models = (None,) if config["algorithm"] in FIXED_TOPOLOGIES else args.models
+        delays = args.delays if "md" in config else (None,)
+        for model, seed, delay, repetition in itertools.product(models, args.seeds, delays, range(args.repeat)):
+            yield {**config, "model": model, "seed": seed, "delay": delay, "repetition": repetition}
+
+
+def run_key(config: dict, args: argparse.Namespace) -> str:
+    options = {option: getattr(args, option) for option in KEY_OPTIONS}
+    return json.dumps({**config, **options}, sort_keys=True)
+
+
+def finished_keys(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r") as f:
+        results = [json.loads(line) for line in f if line.strip()]
+    # The latest result of a configuration counts, a retried run may have failed again
+    status = {result.get("key"): result.get("status") for result in results}
+    return {key for key, latest in status.items() if latest in FINISHED}
+
+
+def _init_worker(slots: multiprocessing.Queue) -> None:
+    global _slot
+    _slot = slots.get()
+
+
+def run_configuration(config: dict, args: argparse.Namespace) -> dict:
+    """
+    Run a single configuration in a pool worker, on the worker's own port range.
+    """
+    run_args = argparse.Namespace(**{
+        **vars(args),
+        "seed": config["seed"],
+        "delay": config["delay"] or args.delays[0],
+        "baseport": args.baseport + _slot * args.ports,
+    })
+    try:
+        result = run_benchmark(config, run_args)
+    except ValueError as e:
+        # E.g. a random graph that is not 2f+1-vertex-connected, recorded so it is skipped on resume as well
+        return {**config, "skipped": str(e), "status": "skipped"}
+    return {**result, "status": run_status(result, args)}
+
+
+def injected(result: dict) -> Optional[str]:
+    # The fault file of a run, "none" (the default of -inject) injects nothing
+    inject = result.get("inject")
+    return inject if inject not in (None, "", "none") else None
+
+
+def run_status(result: dict, args: argparse.Namespace) -> str:
+    """
+    ok if every node started and stopped and, unless faults were injected, every node delivered every broadcast.
+    """
+    n = result["nodes"]
+    if result.get("started") != n or result.get("stopped") != n:
+        return "incomplete"
+    if "md" in result and not injected(result) and (result.get("deliveries") or 0) < n * min(args.broadcasts, n):
+        return "incomplete"
+    return "ok"
+
+
+def row(result: dict) -> Dict[str, str]:
+    values = dict(result)
+    values["last"] = result.get("last_delivery") if result.get("md") else result.get("last_stop")
+    values["rss_max_mib"] = result["rss_max_kb"] / 1024 if result.get("rss_max_kb") else None
+    values["inject"] = os.path.basename(injected(result)) if injected(result) else None
+    return {header: fmt(values.get(field), spec) for header, field, spec in COLUMNS}
+
+
+def print_table(rows: List[Dict[str, str]]) -> None:
+    widths = {header: max([len(header)] + [len(r[header]) for r in rows]) for header, _, _ in COLUMNS}
+    print(" ".join(f"{header:>{widths[header]}}" for header, _, _ in COLUMNS))
+    for r in rows:
+        print(" ".join(f"{r[header]:>{widths[header]}}" for header, _, _ in COLUMNS))
+
+
+def write_table(path: str, rows: List[Dict[str, str]]) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=[header for header, _, _ in COLUMNS])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def sweep(args: argparse.Namespace) -> List[dict]:
+    """
+    Run the configurations of the grid that are not in the results file yet, and return the results of the whole grid.
+    """
+    configs: List[Tuple[str, dict]] = [(run_key(config, args), config) for config in grid(args)]
+    done = finished_keys(args.out)
+    todo = [(key, config) for key, config in configs if key not in done]
+    print(f"{len(configs)} configurations, {len(configs) - len(todo)} already finished, {len(todo)} to run on "
+          f"{args.workers} workers")
+
+    commit = version()
+    if todo:
+        # The port ranges of the workers, every worker takes one when it starts
+        slots = multiprocessing.Queue()
+        for slot in range(args.workers):
+            slots.put(slot)
+        with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(slots,)) as pool:
+            futures = {pool.submit(run_configuration, config, args): (key, config) for key, config in todo}
+            for count, future in enumerate(as_completed(futures), 1):
+                key, config = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Recorded and retried on resume, the other runs carry on
+                    result = {**config, "status": "error", "error": repr(e)}
+                result.update(key=key, version=commit, timestamp=time.time(), workers=args.workers)
+                with open(args.out, "a") as f:
+                    f.write(json.dumps(result) + "\n")
+                print(f"[{count}/{len(todo)}] {result['algorithm']} n={result['nodes']} k={result['degree']} "
+                      f"f={result['max_fault']} seed={result['seed']} {result['status']}")
+
+    # The latest result of every configuration of the grid, in grid order
+    results = {}
+    if os.path.exists(args.out):
+        with open(args.out, "r") as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    results[result.get("key")] = result
+    return [results[key] for key, _ in configs if key in results]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="Sweep", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-algorithms", type=str, nargs="+", default=["dolev"])
+    parser.add_argument("-sizes", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("-degrees", type=int, nargs="+", default=[3, 5], help="num_connections of the topologies")
+    parser.add_argument("-faults", type=int, nargs="+", default=[1])
+    parser.add_argument("-models", type=str, nargs="+", default=["connected"], choices=MODELS,
+                        help="topo_generator models of the random topologies")
+    parser.add_argument("-seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("-delays", type=str, nargs="+", default=["none"], help="delay models of dolev sends")
+    parser.add_argument("-md", type=str, nargs="+", default=["123456"], help="dolev optimisations, e.g. 123456 none")
+    parser.add_argument("-inject", type=str, nargs="+", default=["none"], help="fault files (see faults.py) or none")
+    parser.add_argument("-broadcasts", type=int, default=2, help="number of dolev nodes that broadcast a message")
+    parser.add_argument("-descending", action="store_true", help="ring ids decrease along the successors")
+    parser.add_argument("-batch", action="store_true")
+    parser.add_argument("-auth", type=str, default="signature", choices=("signature", "mac", "none"))
+    parser.add_argument("-curve", type=str, default="medium", help="key type of the nodes, see keys.py")
+    parser.add_argument("-mode", type=str, default="process", choices=MODES)
+    parser.add_argument("-repeat", type=int, default=1)
+    parser.add_argument("-workers", type=int, default=None,
+                        help="runs at the same time, by default as many as the CPU cores fit (see above)")
+    parser.add_argument("-baseport", type=int, default=BASE_PORT, help="first UDP port of the port ranges")
+    parser.add_argument("-timeout", type=float, default=30, help="seconds a node waits for its neighbours")
+    parser.add_argument("-limit", type=float, default=120, help="seconds after which a run is interrupted")
+    parser.add_argument("-out", type=str, default="bench/sweep.jsonl", help="results file, also used to resume")
+    parser.add_argument("-table", type=str, default=None, help="also write the results table to this CSV file")
+    args = parser.parse_args()
+
+    # Every worker gets a range of ports as large as the largest topology
+    args.ports = max((config["nodes"] for config in grid(args)), default=2)
+    if args.workers is None:
+        # A process mode run keeps up to one core per node busy, more workers would only slow down every run
+        cores = os.cpu_count() or 1
+        args.workers = max(1, cores // args.ports) if args.mode == "process" else cores
+    if args.baseport + args.workers * args.ports > 65535:
+        parser.error(f"{args.workers} workers need {args.workers * args.ports} ports from {args.baseport}")
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    # Generate the nodes' keys once, before the workers start their runs
+    load_keys(args.ports, args.curve)
+
+    rows = [row(result) for result in sweep(args)]
+    print_table(rows)
+    if args.table:
+        write_table(args.table, rows)
+        print(f"Table written to {args.table}")
+    print(f"Results appended to {args.out}")
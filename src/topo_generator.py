@@ -1,74 +1,409 @@
-import itertools
-import sys
+import math
 import random
+from array import array
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
 
+Edge = Tuple[int, int]
 
-def generate_connections(n, k):
-    if k >= n:
-        raise ValueError("k should be less than n for a connected network.")
-    connections = [[] for _ in range(n)]
-    for node in range(n):  # Iterate through nodes
-        available_nodes = tuple(
-            id_  # only keep the node's id, available_nodes doesn't need a reference to each node's connections
-            for id_, conns in sorted(  # sort nodes by the number of connections they already have - fewest first
-                # get nodes > current node with their connections in random order
-                random.sample(tuple(enumerate(connections[node + 1 :], node + 1)), n - node - 1),
-                # tuple(enumerate(connections[node + 1:], node + 1)),  # keep this line to turn off random if you prefer
-                key=lambda x: len(x[1]),  # stable sorting -> the nodes with the same number of conns are still random
-            )
-            if len(conns) < k  # filter out nodes that are already fully connected to k other nodes
-        )
-        if len(available_nodes) < k - len(connections[node]):  # fewer nodes available than needed - add extra edge(s)
-            new_conns = (
-                *available_nodes,  # connect to all the available nodes to add as few extra edges as possible
-                *tuple(  # to connect this node to at least k others, add extra edges to already fully connected nodes
-                    y
-                    for y, _ in sorted(  # sort nodes by the number of connections they already have - fewest first
-                        random.sample(  # get nodes not being the current node and not already connected in random order
-                            tuple(
-                                x
-                                for x in enumerate(connections)  # get node-id's with their connections
-                                if x[0] not in (*available_nodes, node, *connections[node])
-                            ),
-                            n - len(available_nodes) - len(connections[node]) - 1,
-                        ),
-                        key=lambda x: len(x[1]),  # stable sorting -> nodes with the same number of conns still random
-                    )
-                )[
-                    : k - len(available_nodes) - len(connections[node])
-                ],  # only keep necessary number of conn candidates
-            )
-        elif available_nodes and k - len(connections[node]) > 0:  # normal case - enough nodes available for connection
-            new_conns = available_nodes[: k - len(connections[node])]  # connect to necessary number of available nodes
-        else:  # the node is already fully connected as other nodes already have connected to it, occurs towards end
+
+class Graph:
+    """
+    Undirected graph in compressed sparse row form: the neighbours of node v are
+    ``targets[offsets[v]:offsets[v + 1]]`` (sorted in generated graphs). Both arrays are flat machine-int arrays, so a
+    graph with millions of edges takes a few bytes per edge instead of a Python list per node.
+    """
+
+    __slots__ = ("offsets", "targets")
+
+    def __init__(self, offsets: array, targets: array) -> None:
+        self.offsets = offsets
+        self.targets = targets
+
+    @classmethod
+    def from_edges(cls, n: int, edges: Iterable[Edge]) -> "Graph":
+        """
+        Build a graph from undirected edges, in O(n + m) plus sorting the neighbours of every node.
+        Self-loops and duplicate edges are the caller's responsibility.
+        """
+        us, vs = array("l"), array("l")
+        for u, v in edges:
+            us.append(u)
+            vs.append(v)
+        degree = array("l", [0]) * n
+        for u in us:
+            degree[u] += 1
+        for v in vs:
+            degree[v] += 1
+        offsets = array("l", [0]) * (n + 1)
+        for v in range(n):
+            offsets[v + 1] = offsets[v] + degree[v]
+        targets = array("l", [0]) * offsets[n]
+        fill = array("l", offsets[:n])
+        for u, v in zip(us, vs):
+            targets[fill[u]] = v
+            fill[u] += 1
+            targets[fill[v]] = u
+            fill[v] += 1
+        for v in range(n):
+            start, end = offsets[v], offsets[v + 1]
+            if end - start > 1:
+                targets[start:end] = array("l", sorted(targets[start:end]))
+        return cls(offsets, targets)
+
+    @classmethod
+    def from_adjacency(cls, adjacency: Mapping[int, Iterable[int]]) -> "Graph":
+        """
+        Build a graph from a topology dict (node id -> neighbour ids), as stored in the topology YAML files.
+        Node ids have to be 0..n-1; every edge is expected to be listed on both of its nodes. The order of the
+        neighbours is kept, as algorithms like the ring election depend on it.
+        """
+        n = max(adjacency, default=-1) + 1
+        offsets = array("l", [0]) * (n + 1)
+        targets = array("l")
+        for v in range(n):
+            targets.extend(adjacency.get(v, ()))
+            offsets[v + 1] = len(targets)
+        return cls(offsets, targets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets) // 2
+
+    def neighbours(self, v: int) -> array:
+        return self.targets[self.offsets[v]:self.offsets[v + 1]]
+
+    def degree(self, v: int) -> int:
+        return self.offsets[v + 1] - self.offsets[v]
+
+    def min_degree(self) -> int:
+        return min((self.degree(v) for v in range(len(self))), default=0)
+
+    def edges(self) -> Iterable[Edge]:
+        for u in range(len(self)):
+            for v in self.neighbours(u):
+                if u < v:
+                    yield u, v
+
+    def to_dict(self) -> Dict[int, List[int]]:
+        """
+        The topology dict used by run.py and the topology YAML files.
+        """
+        return {v: self.neighbours(v).tolist() for v in range(len(self))}
+
+
+def _rng(seed: Optional[int]):
+    # Without a seed the global random module is used, so seeding it makes the graphs reproducible as well
+    return random if seed is None else random.Random(seed)
+
+
+def harary(n: int, k: int) -> Graph:
+    """
+    The Harary graph H(k, n): a k-vertex-connected graph with the minimum number of edges, ceil(k * n / 2).
+    Every node has degree k, apart from node 0 which has degree k + 1 when both k and n are odd.
+    """
+    if not 1 <= k < n:
+        raise ValueError("k should be at least 1 and less than n.")
+    edges = [(v, (v + j) % n) for v in range(n) for j in range(1, k // 2 + 1)]
+    if k % 2:
+        # Connect every node to the one (about) half way around the ring
+        half = (n + 1) // 2
+        edges.extend((v, (v + half) % n) for v in range(half))
+    return Graph.from_edges(n, edges)
+
+
+def _relabel(graph: Graph, rng) -> List[Edge]:
+    permutation = list(range(len(graph)))
+    rng.shuffle(permutation)
+    return [(permutation[u], permutation[v]) for u, v in graph.edges()]
+
+
+def k_connected(n: int, k: int, extra_edges: int = 0, seed: Optional[int] = None) -> Graph:
+    """
+    A random k-vertex-connected graph: a Harary graph with randomly permuted node ids, plus `extra_edges` random
+    edges. Adding edges never lowers connectivity, so the guarantee holds by construction.
+    """
+    rng = _rng(seed)
+    edges = _relabel(harary(n, k), rng)
+    if extra_edges > n * (n - 1) // 2 - len(edges):
+        raise ValueError("Too many extra edges for a simple graph.")
+    adjacency: List[Set[int]] = [set() for _ in range(n)]
+    for u, v in edges:
+        adjacency[u].add(v)
+        adjacency[v].add(u)
+    while extra_edges:
+        u, v = rng.randrange(n), rng.randrange(n)
+        if u != v and v not in adjacency[u]:
+            adjacency[u].add(v)
+            adjacency[v].add(u)
+            edges.append((u, v))
+            extra_edges -= 1
+    return Graph.from_edges(n, edges)
+
+
+def k_regular(n: int, k: int, swaps: Optional[int] = None, seed: Optional[int] = None) -> Graph:
+    """
+    A random k-regular graph (one node gets degree k + 1 when n * k is odd): a relabelled Harary graph randomised
+    with `swaps` degree-preserving double edge swaps (default 2 per edge). Swaps keep the degrees but not the
+    connectivity, check it with is_k_vertex_connected() or use k_connected() when it has to be guaranteed.
+    """
+    rng = _rng(seed)
+    edges = _relabel(harary(n, k), rng)
+    adjacency: List[Set[int]] = [set() for _ in range(n)]
+    for u, v in edges:
+        adjacency[u].add(v)
+        adjacency[v].add(u)
+    m = len(edges)
+    for _ in range(2 * m if swaps is None else swaps):
+        # (a, b), (c, d) -> (a, d), (c, b)
+        i, j = rng.randrange(m), rng.randrange(m)
+        a, b = edges[i]
+        c, d = edges[j] if rng.random() < 0.5 else edges[j][::-1]
+        if len({a, b, c, d}) < 4 or d in adjacency[a] or b in adjacency[c]:
             continue
-        connections[node].extend(new_conns)
-        for i in new_conns:  # connections are bidirectional - add this node to the other nodes it connects to
-            connections[i].append(node)
-    # If two nodes have more than k edges and are connected, remove edge between them. Rarely happens
-    for nodes in itertools.combinations((index for index, nodes_ in enumerate(connections) if len(nodes_) > k), 2):
-        if all(x in connections[x] and len(connections[x]) > k for x in nodes):
-            for node_1, node_2 in (nodes, reversed(nodes)):  # Remove edge in both nodes / both directions
-                connections[node_1].remove(node_2)
-    return connections
+        adjacency[a].remove(b)
+        adjacency[b].remove(a)
+        adjacency[c].remove(d)
+        adjacency[d].remove(c)
+        adjacency[a].add(d)
+        adjacency[d].add(a)
+        adjacency[c].add(b)
+        adjacency[b].add(c)
+        edges[i] = (a, d)
+        edges[j] = (c, b)
+    return Graph.from_edges(n, edges)
+
 
+def erdos_renyi(n: int, p: float, seed: Optional[int] = None) -> Graph:
+    """
+    A G(n, p) random graph, generated in O(n + m) by skipping geometrically distributed runs of absent edges
+    (Batagelj & Brandes, 2005).
+    """
+    rng = _rng(seed)
+    if p <= 0:
+        return Graph.from_edges(n, ())
+    if p >= 1:
+        return Graph.from_edges(n, ((u, v) for v in range(n) for u in range(v)))
+    edges = []
+    log_q = math.log(1.0 - p)
+    v, w = 1, -1
+    while v < n:
+        w += 1 + int(math.log(1.0 - rng.random()) / log_q)
+        while w >= v and v < n:
+            w -= v
+            v += 1
+        if v < n:
+            edges.append((v, w))
+    return Graph.from_edges(n, edges)
 
-def get_optimal_connections(n, k):
-    optimal_conns = None
-    conn_num = sys.maxsize
-    seed = 0
-    i = 0
-    for i in range(10):  # Try up to 10 times to find a solutions without additional edges
-        random.seed(i)
-        connections = generate_connections(n, k)
-        conn_num = sum(len(conns) - k for conns in connections)  # conn_num is the number of additional edges
-        if optimal_conns is None or conn_num < sum(len(c) - k for c in optimal_conns):  # first run or better conn_num
-            optimal_conns = connections  # only update if connections actually is better (lower conn_num) than before
-            seed = i
-            if not conn_num:  # Immediately leave the loop if there are no additional edge, mostly occurs in first loop
+
+def small_world(n: int, k: int, p: float, seed: Optional[int] = None) -> Graph:
+    """
+    A Watts-Strogatz small-world graph: a ring where every node is connected to its k nearest nodes (k even), after
+    which the far end of every edge is rewired to a random node with probability p.
+    """
+    if k % 2 or not 2 <= k < n - 1:
+        raise ValueError("k should be even, at least 2 and less than n - 1.")
+    rng = _rng(seed)
+    adjacency: List[Set[int]] = [set() for _ in range(n)]
+    for u in range(n):
+        for j in range(1, k // 2 + 1):
+            adjacency[u].add((u + j) % n)
+            adjacency[(u + j) % n].add(u)
+    for j in range(1, k // 2 + 1):
+        for u in range(n):
+            v = (u + j) % n
+            if rng.random() >= p or len(adjacency[u]) >= n - 1:
+                continue
+            w = rng.randrange(n)
+            while w == u or w in adjacency[u]:
+                w = rng.randrange(n)
+            adjacency[u].remove(v)
+            adjacency[v].remove(u)
+            adjacency[u].add(w)
+            adjacency[w].add(u)
+    return Graph.from_edges(n, ((u, v) for u in range(n) for v in adjacency[u] if u < v))
+
+
+def scale_free(n: int, m: int, seed: Optional[int] = None) -> Graph:
+    """
+    A Barabási-Albert scale-free graph: starting from a clique of m + 1 nodes, every new node connects to m distinct
+    existing nodes chosen with probability proportional to their degree. Every node has degree at least m.
+    """
+    if not 1 <= m < n:
+        raise ValueError("m should be at least 1 and less than n.")
+    rng = _rng(seed)
+    edges = [(u, v) for v in range(m + 1) for u in range(v)]
+    # Every node appears once per edge end, so a uniform pick from this list is a degree-proportional pick
+    ends = array("l", (x for edge in edges for x in edge))
+    for v in range(m + 1, n):
+        targets: Set[int] = set()
+        while len(targets) < m:
+            targets.add(ends[rng.randrange(len(ends))])
+        for u in targets:
+            edges.append((u, v))
+            ends.append(u)
+            ends.append(v)
+    return Graph.from_edges(n, edges)
+
+
+class _SplitGraph:
+    """
+    Unit-capacity flow network for counting vertex-disjoint paths: node v is split into v_in = 2v and v_out = 2v + 1
+    joined by an arc of capacity 1, every undirected edge {u, v} becomes the arcs u_out -> v_in and v_out -> u_in.
+    Arcs are stored in pairs, arc i ^ 1 is the residual arc of arc i.
+    """
+
+    def __init__(self, graph: Graph) -> None:
+        n = len(graph)
+        heads = array("l")
+        tails = array("l")
+        for v in range(n):
+            tails.extend((2 * v, 2 * v + 1))
+            heads.extend((2 * v + 1, 2 * v))
+        for u, v in graph.edges():
+            tails.extend((2 * u + 1, 2 * v))
+            heads.extend((2 * v, 2 * u + 1))
+            tails.extend((2 * v + 1, 2 * u))
+            heads.extend((2 * u, 2 * v + 1))
+        self.heads = heads
+        # Forward arcs have capacity 1, residual arcs start at 0
+        self.capacity = array("b", [1, 0]) * (len(heads) // 2)
+        # Outgoing arcs per split node, in CSR form
+        count = [0] * (2 * n + 1)
+        for tail in tails:
+            count[tail + 1] += 1
+        for i in range(2 * n):
+            count[i + 1] += count[i]
+        self.offsets = array("l", count)
+        self.arcs = array("l", [0]) * len(tails)
+        fill = count[:]
+        for arc, tail in enumerate(tails):
+            self.arcs[fill[tail]] = arc
+            fill[tail] += 1
+
+    def disjoint_paths(self, s: int, t: int, limit: int) -> int:
+        """
+        The number of internally vertex-disjoint paths between the non-adjacent nodes s and t, counted up to limit.
+        """
+        capacity = self.capacity[:]
+        heads, offsets, arcs = self.heads, self.offsets, self.arcs
+        source, sink = 2 * s + 1, 2 * t
+        flow = 0
+        while flow < limit:
+            parent = [-1] * (len(offsets) - 1)
+            parent[source] = -2
+            queue = deque((source,))
+            while queue and parent[sink] == -1:
+                x = queue.popleft()
+                for i in range(offsets[x], offsets[x + 1]):
+                    arc = arcs[i]
+                    y = heads[arc]
+                    if capacity[arc] and parent[y] == -1:
+                        parent[y] = arc
+                        queue.append(y)
+            if parent[sink] == -1:
                 break
-    print(
-        f"Random seed {seed}{f', tried seeds from 0 to {i} to avoid {conn_num} additional edge(s)' if conn_num else ''}"
-    )
-    print(f"Connections: {dict(enumerate(optimal_conns))}")
-    return optimal_conns
+            y = sink
+            while y != source:
+                arc = parent[y]
+                capacity[arc] -= 1
+                capacity[arc ^ 1] += 1
+                y = heads[arc ^ 1]
+            flow += 1
+        return flow
+
+
+def _min_local_connectivity(graph: Graph, limit: int) -> int:
+    """
+    min(vertex connectivity, limit), following Esfahanian & Hakimi (1984): for a node v of minimum degree, the
+    connectivity is the minimum local connectivity between v and every node it is not adjacent to, and between every
+    two non-adjacent neighbours of v.
+    """
+    n = len(graph)
+    if n < 2:
+        return 0
+    v = min(range(n), key=graph.degree)
+    limit = min(limit, graph.degree(v))
+    adjacent = set(graph.neighbours(v))
+    flows = _SplitGraph(graph)
+    for w in range(n):
+        if limit == 0:
+            return 0
+        if w != v and w not in adjacent:
+            limit = min(limit, flows.disjoint_paths(v, w, limit))
+    neighbours = sorted(adjacent)
+    for i, x in enumerate(neighbours):
+        x_adjacent = set(graph.neighbours(x))
+        for y in neighbours[i + 1:]:
+            if limit == 0:
+                return 0
+            if y not in x_adjacent:
+                limit = min(limit, flows.disjoint_paths(x, y, limit))
+    return limit
+
+
+def vertex_connectivity(graph: Graph) -> int:
+    """
+    The minimum number of nodes whose removal disconnects the graph (n - 1 for a complete graph).
+    Takes O(n + d^2) max-flow computations of at most d augmenting paths each, d being the minimum degree.
+    """
+    return _min_local_connectivity(graph, len(graph) - 1)
+
+
+def is_k_vertex_connected(graph: Graph, k: int) -> bool:
+    return _min_local_connectivity(graph, k) >= k
+
+
+def tolerates_faults(graph: Graph, max_fault: int) -> bool:
+    """
+    Whether Dolev's reliable broadcast works with up to `max_fault` Byzantine nodes: by Menger's theorem every pair of
+    nodes then has 2f + 1 vertex-disjoint paths, so f + 1 of them avoid all faulty nodes.
+    """
+    return is_k_vertex_connected(graph, 2 * max_fault + 1)
+
+
+MODELS = ("regular", "connected", "er", "smallworld", "scalefree")
+
+
+def generate(model: str, n: int, k: int, p: float = 0.1, seed: Optional[int] = None) -> Graph:
+    """
+    Generate a topology by model name, k being the (average) degree:
+        regular       random k-regular graph
+        connected     random k-vertex-connected graph (relabelled Harary graph)
+        er            Erdős–Rényi graph with edge probability k / (n - 1), p is ignored
+        smallworld    Watts-Strogatz graph with rewiring probability p
+        scalefree     Barabási-Albert graph where every new node brings k // 2 edges
+    """
+    if model == "regular":
+        return k_regular(n, k, seed=seed)
+    if model == "connected":
+        return k_connected(n, k, seed=seed)
+    if model == "er":
+        return erdos_renyi(n, k / (n - 1), seed=seed)
+    if model == "smallworld":
+        return small_world(n, k, p, seed=seed)
+    if model == "scalefree":
+        return scale_free(n, max(1, k // 2), seed=seed)
+    raise ValueError(f"Unknown topology model {model!r}, expected one of {', '.join(MODELS)}")
+
+
+def generate_connections(n: int, k: int, seed: Optional[int] = None) -> List[List[int]]:
+    """
+    Neighbour lists of a random k-regular graph, one extra edge is added when n * k is odd.
+    """
+    if k >= n:
+        raise ValueError("k should be less than n for a connected network.")
+    graph = k_regular(n, k, seed=seed)
+    return [graph.neighbours(v).tolist() for v in range(n)]
+
+
+def get_optimal_connections(n: int, k: int, seed: int = 0) -> List[List[int]]:
+    connections = generate_connections(n, k, seed)
+    extra = sum(len(conns) - k for conns in connections)
+    print(f"Random seed {seed}{f', {extra} additional edge(s) as n * k is odd' if extra else ''}")
+    print(f"Connections: {dict(enumerate(connections))}")
+    return connections
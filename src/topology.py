@@ -0,0 +1,154 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Mapping, Union
+
+import yaml
+
+from topo_generator import Graph
+
+# Binary topology file: header, n + 1 uint64 offsets, then the uint32 neighbour ids of all nodes, all little-endian.
+# The neighbours of node v are entries offsets[v]..offsets[v + 1] of the neighbour array.
+MAGIC = b"TOPO"
+VERSION = 1
+_HEADER = struct.Struct("<4sB3xQQ")  # magic, version, node count, neighbour count
+_OFFSET = struct.Struct("<Q")
+_OFFSET_SIZE = _OFFSET.size
+_NEIGHBOUR_SIZE = 4
+
+
+def _little_endian(values: array) -> array:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def _typecode(size: int) -> str:
+    return next(code for code in "IL" if array(code).itemsize == size)
+
+
+def write_topology(path: str, topology: Union[Graph, Mapping[int, Iterable[int]]]) -> None:
+    """
+    Write a topology (a Graph or a node id -> neighbour ids dict) in the binary format.
+    """
+    graph = topology if isinstance(topology, Graph) else Graph.from_adjacency(topology)
+    offsets = _little_endian(array("Q", graph.offsets))
+    neighbours = _little_endian(array(_typecode(_NEIGHBOUR_SIZE), graph.targets))
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(graph), len(graph.targets)))
+        offsets.tofile(f)
+        neighbours.tofile(f)
+
+
+def is_binary(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class TopologyFile:
+    """
+    Memory-mapped binary topology: reading the neighbours of one node only touches its own two offsets and slice of
+    the neighbour array, O(degree), however large the topology is.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.node_count, neighbour_count = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} binary topology file")
+        self._neighbours_start = _HEADER.size + (self.node_count + 1) * _OFFSET_SIZE
+        if len(self._mmap) < self._neighbours_start + neighbour_count * _NEIGHBOUR_SIZE:
+            self.close()
+            raise ValueError(f"{path} is truncated")
+
+    def __enter__(self) -> "TopologyFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.node_count
+
+    def __contains__(self, node_id: int) -> bool:
+        return 0 <= node_id < self.node_count
+
+    def neighbours(self, node_id: int) -> List[int]:
+        if node_id not in self:
+            raise KeyError(node_id)
+        start, end = struct.unpack_from("<2Q", self._mmap, _HEADER.size + node_id * _OFFSET_SIZE)
+        begin = self._neighbours_start + start * _NEIGHBOUR_SIZE
+        values = array(_typecode(_NEIGHBOUR_SIZE), self._mmap[begin:begin + (end - start) * _NEIGHBOUR_SIZE])
+        return _little_endian(values).tolist()
+
+    def to_dict(self) -> Dict[int, List[int]]:
+        return {node_id: self.neighbours(node_id) for node_id in range(self.node_count)}
+
+    def close(self) -> None:
+        self._mmap.close()
+
+
+def load_topology(path: str) -> Dict[int, List[int]]:
+    """
+    The whole topology as a node id -> neighbour ids dict, from a binary or a YAML topology file.
+    """
+    if is_binary(path):
+        with TopologyFile(path) as topology:
+            return topology.to_dict()
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
+
+
+def load_neighbours(path: str, node_id: int) -> List[int]:
+    """
+    The neighbours of a single node. Binary files are memory-mapped and only the node's own slice is read, YAML files
+    are parsed completely.
+    """
+    if is_binary(path):
+        with TopologyFile(path) as topology:
+            return topology.neighbours(node_id)
+    return load_topology(path)[node_id]
+
+
+def topology_size(path: str) -> int:
+    """
+    The number of nodes in a binary or YAML topology file.
+    """
+    if is_binary(path):
+        with TopologyFile(path) as topology:
+            return len(topology)
+    return len(load_topology(path))
+
+
+def save_topology(path: str, topology: Union[Graph, Mapping[int, Iterable[int]]]) -> None:
+    """
+    Write a topology as binary when the path ends with .topo, as YAML otherwise.
+    """
+    if path.endswith(".topo"):
+        write_topology(path, topology)
+        return
+    connections = topology.to_dict() if isinstance(topology, Graph) else dict(topology)
+    with open(path, "w") as f:
+        yaml.safe_dump(connections, f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert YAML topology files to the binary .topo format")
+    parser.add_argument("topologies", type=str, nargs="+", help="YAML topology files, e.g. topologies/*.yaml")
+    parser.add_argument("-out", type=str, default=None, help="output directory, next to the YAML file by default")
+    args = parser.parse_args()
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    for yaml_path in args.topologies:
+        name = os.path.splitext(os.path.basename(yaml_path))[0] + ".topo"
+        out_path = os.path.join(args.out or os.path.dirname(yaml_path), name)
+        topology = load_topology(yaml_path)
+        write_topology(out_path, topology)
+        print(f"{yaml_path} -> {out_path} ({len(topology)} nodes, {os.path.getsize(out_path)} bytes)")
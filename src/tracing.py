@@ -0,0 +1,154 @@
+import json
+import os
+import time
+from typing import Any, Callable, List, Optional, TextIO, Tuple
+
+DEBUG = 10
+INFO = 20
+OFF = 100
+LEVELS = {"debug": DEBUG, "info": INFO, "off": OFF}
+
+# Event kinds
+START = "start"
+STOP = "stop"
+SEND = "send"
+RECEIVE = "receive"
+DELIVER = "deliver"
+DROP = "drop"
+STATUS = "status"
+
+# (time, level, kind, peer, message type, size, text, text args)
+TraceEvent = Tuple[float, int, str, Optional[int], Optional[str], int, Optional[str], tuple]
+
+_ANSI = {DELIVER: "\033[1;32;48m", DROP: "\033[1;31;48m"}
+
+
+def format_text(event: TraceEvent) -> Optional[str]:
+    text, args = event[6], event[7]
+    if text is None:
+        return None
+    return text.format(*args) if args else text
+
+
+class Tracer:
+    """
+    Records typed events of one node. Recording is a level check plus a tuple append into a preallocated ring
+    buffer; text is only formatted when an event is written out. The buffer is written to a JSONL file by flush()
+    (called periodically by the node, never on the send/receive path); when it wraps before a flush, the oldest
+    events are overwritten and counted in `dropped`. The console sink prints start/stop/status/deliver/drop events
+    immediately, in the same format the algorithms used to print.
+    """
+
+    def __init__(
+        self,
+        node_id: Optional[int] = None,
+        level: int = DEBUG,
+        console: bool = True,
+        path: Optional[str] = None,
+        capacity: int = 65536,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.node_id = node_id
+        self.console = console
+        self.path = path
+        self.clock = clock
+        self.capacity = capacity
+        self.dropped = 0
+        self._buffer: List[Any] = [None] * capacity if path else []
+        self._head = 0  # index of the oldest buffered event
+        self._count = 0
+        self._file: Optional[TextIO] = None
+        # Without any sink, everything is filtered out by the level check
+        self.level = level if (console or path) else OFF
+        # Send/receive events carry no text, they only end up in the trace file
+        self.packets = bool(path) and self.level <= DEBUG
+
+    def enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def record(
+        self,
+        level: int,
+        kind: str,
+        peer: Optional[int] = None,
+        msg_type: Optional[str] = None,
+        size: int = 0,
+        text: Optional[str] = None,
+        args: tuple = (),
+    ) -> None:
+        if level < self.level:
+            return
+        event = (self.clock(), level, kind, peer, msg_type, size, text, args)
+        if self.console and text is not None:
+            self._print(event)
+        if self.path:
+            tail = (self._head + self._count) % self.capacity
+            self._buffer[tail] = event
+            if self._count == self.capacity:
+                self._head = (self._head + 1) % self.capacity
+                self.dropped += 1
+            else:
+                self._count += 1
+
+    def _print(self, event: TraceEvent) -> None:
+        colour = _ANSI.get(event[2], "")
+        print(f"[Node {self.node_id}] {colour}{format_text(event)}")
+
+    def send(self, peer: Optional[int], msg_type: str, size: int = 0) -> None:
+        self.record(DEBUG, SEND, peer, msg_type, size)
+
+    def receive(self, peer: Optional[int], msg_type: str, size: int = 0) -> None:
+        self.record(DEBUG, RECEIVE, peer, msg_type, size)
+
+    def status(self, text: str, *args: Any, level: int = INFO) -> None:
+        self.record(level, STATUS, text=text, args=args)
+
+    def deliver(self, peer: Optional[int], text: str, *args: Any) -> None:
+        self.record(INFO, DELIVER, peer, text=text, args=args)
+
+    def drop(self, peer: Optional[int], text: str, *args: Any) -> None:
+        self.record(INFO, DROP, peer, text=text, args=args)
+
+    def start(self) -> None:
+        self.record(INFO, START, text="Starting")
+
+    def stop(self) -> None:
+        self.record(INFO, STOP, text="Stopping algorithm")
+
+    def flush(self) -> None:
+        if not self.path or not self._count:
+            return
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a")
+        lines = []
+        for i in range(self._count):
+            index = (self._head + i) % self.capacity
+            event = self._buffer[index]
+            self._buffer[index] = None
+            lines.append(json.dumps({
+                "t": event[0],
+                "node": self.node_id,
+                "kind": event[2],
+                "peer": event[3],
+                "type": event[4],
+                "size": event[5],
+                "text": format_text(event),
+            }))
+        self._head = 0
+        self._count = 0
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_trace(path: str) -> List[dict]:
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
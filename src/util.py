@@ -2,7 +2,8 @@ import yaml
 import copy
 import argparse
 
-from topo_generator import generate_connections
+from topo_generator import MODELS, generate, tolerates_faults
+from topology import save_topology
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -15,6 +16,10 @@ if __name__ == "__main__":
     parser.add_argument("algorithm", type=str, nargs="?", default="echo")
     parser.add_argument("template_file", type=str, nargs="?", default="docker-compose.template.yml")
     parser.add_argument("num_connections", type=int, default=2)
+    parser.add_argument("-model", type=str, default="regular", choices=MODELS, help="random graph model of the topology")
+    parser.add_argument("-p", type=float, default=0.1, help="rewiring probability of the smallworld model")
+    parser.add_argument("-seed", type=int, default=None, help="random seed of the topology")
+    parser.add_argument("-fault", type=int, default=None, help="check the topology tolerates this many Byzantine nodes")
     args = parser.parse_args()
 
     with open(args.template_file, "r") as f:
@@ -25,10 +30,14 @@ if __name__ == "__main__":
 
         nodes = {}
         baseport = 9090
-        if args.num_connections == 2:
+        if args.num_connections == 2 and args.model == "regular":
             connections = dict((i, [(i + 1) % args.num_nodes, (i - 1) % args.num_nodes]) for i in range(args.num_nodes))
         else:
-            connections = dict(enumerate(generate_connections(args.num_nodes, args.num_connections)))
+            graph = generate(args.model, args.num_nodes, args.num_connections, args.p, args.seed)
+            if args.fault is not None and not tolerates_faults(graph, args.fault):
+                print(f"Warning: the topology is not {2 * args.fault + 1}-vertex-connected, Dolev cannot tolerate "
+                      f"{args.fault} Byzantine node(s)")
+            connections = graph
 
         # Create a topology
         for i in range(args.num_nodes):
@@ -46,6 +55,6 @@ if __name__ == "__main__":
             yaml.safe_dump(content, f2)
             print(f"Output written to docker-compose.yml")
 
-        with open(args.topology_file, "w") as f3:
-            yaml.safe_dump(connections, f3)
-            print(f"Output written to {args.topology_file}")
+        # A .topo file name writes the compact binary format, anything else YAML
+        save_topology(args.topology_file, connections)
+        print(f"Output written to {args.topology_file}")
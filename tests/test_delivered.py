@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+from algorithms.delivered import DeliveredSet
+from algorithms.dolev import Message, message_key
+
+
+def test_watermark_moves_up_as_gaps_fill():
+    delivered = DeliveredSet()
+    delivered.add((1, 0, 7))
+    delivered.add((1, 2, 7))
+    assert (1, 0, 7) in delivered and (1, 2, 7) in delivered
+    assert (1, 1, 7) not in delivered
+    assert delivered.pending(1) == 1
+    delivered.add((1, 1, 7))
+    assert delivered.pending(1) == 0
+    assert len(delivered) == 3
+    # Below the watermark every digest counts as delivered, above it only the delivered ones
+    assert (1, 1, 8) in delivered
+    delivered.add((1, 5, 7))
+    assert (1, 5, 8) not in delivered
+    assert (2, 0, 7) not in delivered
+
+
+def test_broadcasts_beyond_the_window_evict_older_ones():
+    delivered = DeliveredSet(window=4)
+    delivered.add((0, 1, 0))
+    delivered.add((0, 6, 0))
+    # The watermark moved to 6 - 4 + 1 = 3: the undelivered 0 and 2 count as delivered, 1 is no longer kept
+    assert (0, 0, 0) in delivered and (0, 2, 0) in delivered
+    assert (0, 4, 0) not in delivered
+    assert delivered.pending(0) == 1
+    delivered.add((0, 6, 0))
+    assert len(delivered) == 2
+
+
+def test_message_key_is_the_same_in_every_process():
+    payload = Message("Hello there!", 3, 5, (3, 1))
+    key = message_key(payload)
+    assert key[:2] == (3, 5)
+    # The path is not part of the key, the same broadcast arrives over many paths
+    assert message_key(Message("Hello there!", 3, 5, (3, 2, 4))) == key
+    assert message_key(Message("Hello there?", 3, 5)) != key
+    script = "from algorithms.dolev import Message, message_key; print(message_key(Message('Hello there!', 3, 5)))"
+    src = os.path.join(os.path.dirname(__file__), os.pardir, "src")
+    for hash_seed in ("1", "2"):
+        env = {**os.environ, "PYTHONHASHSEED": hash_seed, "PYTHONPATH": src}
+        output = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+        assert output.stdout.strip() == str(key)
@@ -0,0 +1,72 @@
+from inbound import BACKPRESSURE, DROP, FIFO, SHED, UNORDERED, InboundQueue
+
+
+class Handlers:
+    """
+    Records the items the queue starts, which keep running until finish() is called.
+    """
+
+    def __init__(self, capacity: int, workers: int, order: str = FIFO, overload: str = DROP) -> None:
+        self.started = []
+        self.pauses = []
+        self.queue = InboundQueue(capacity, workers, order, overload, self.started.append, self.pauses.append)
+
+    def finish(self, item) -> None:
+        self.queue.done(item[0])
+
+
+def test_fifo_handles_a_senders_messages_in_order_one_at_a_time():
+    handlers = Handlers(capacity=10, workers=4)
+    for item in [("a", 1), ("a", 2), ("b", 1), ("a", 3)]:
+        handlers.queue.put(item[0], item)
+    # Only the first message of each sender runs, the other workers stay free
+    assert handlers.started == [("a", 1), ("b", 1)]
+    handlers.finish(("a", 1))
+    handlers.finish(("b", 1))
+    handlers.finish(("a", 2))
+    assert handlers.started == [("a", 1), ("b", 1), ("a", 2), ("a", 3)]
+    assert handlers.queue.depth == 0
+
+
+def test_unordered_uses_every_worker():
+    handlers = Handlers(capacity=10, workers=2, order=UNORDERED)
+    for item in [("a", 1), ("a", 2), ("a", 3)]:
+        handlers.queue.put(item[0], item)
+    assert handlers.started == [("a", 1), ("a", 2)]
+
+
+def test_drop_discards_the_newest_message():
+    handlers = Handlers(capacity=2, workers=1)
+    handlers.queue.put("a", ("a", 1))
+    assert handlers.queue.put("a", ("a", 2)) is None
+    assert handlers.queue.put("a", ("a", 3)) is None
+    assert handlers.queue.put("b", ("b", 1)) == DROP
+    for item in [("a", 1), ("a", 2), ("a", 3)]:
+        handlers.finish(item)
+    assert handlers.started == [("a", 1), ("a", 2), ("a", 3)]
+
+
+def test_shed_discards_the_oldest_message_of_the_busiest_sender():
+    handlers = Handlers(capacity=3, workers=1, overload=SHED)
+    handlers.queue.put("a", ("a", 0))
+    for item in [("a", 1), ("a", 2), ("b", 1)]:
+        assert handlers.queue.put(item[0], item) is None
+    assert handlers.queue.put("b", ("b", 2)) == SHED
+    for item in [("a", 0), ("b", 1), ("a", 2), ("b", 2)]:
+        handlers.finish(item)
+    # ("a", 1) was shed, the order per sender is kept
+    assert handlers.started == [("a", 0), ("b", 1), ("a", 2), ("b", 2)]
+
+
+def test_backpressure_pauses_until_half_empty():
+    handlers = Handlers(capacity=4, workers=1, overload=BACKPRESSURE)
+    handlers.queue.put("a", ("a", 0))
+    for i in range(1, 6):
+        assert handlers.queue.put("a", ("a", i)) is None
+    # Nothing is discarded, reading pauses once four messages wait
+    assert handlers.pauses == [True] and handlers.queue.depth == 5
+    for i in range(3):
+        handlers.finish(("a", i))
+    assert handlers.pauses == [True] and handlers.queue.depth == 2
+    handlers.finish(("a", 3))
+    assert handlers.pauses == [True, False]
@@ -0,0 +1,84 @@
+import random
+
+from algorithms.path_store import DisjointPathStore
+
+
+def test_disjoint_paths_are_selected_greedily():
+    store = DisjointPathStore(0, 3)
+    assert not store.add((0, 1))
+    assert not store.add((0, 2, 3))
+    assert store.add((0, 4, 5))
+    assert store.disjoint_paths == 3
+
+
+def test_direct_path_counts_as_disjoint():
+    store = DisjointPathStore(0, 2)
+    assert not store.add((0, 1, 2))
+    assert store.add(())
+    assert store.direct
+
+
+def test_superset_adds_nothing():
+    store = DisjointPathStore(0, 2)
+    store.add((0, 1))
+    assert not store.add((0, 1, 2))
+    assert len(store) == 1
+    assert store.covers((0, 2, 1))
+    assert not store.covers((0, 2))
+
+
+def test_search_replaces_a_blocking_selection():
+    # The greedy selection {1, 2} blocks {1, 3}, only {1, 3} and {2, 4} together are two disjoint paths
+    store = DisjointPathStore(0, 2)
+    assert not store.add((0, 1, 2))
+    assert not store.add((0, 1, 3))
+    assert store.add((0, 2, 4))
+    assert sorted(store._selected) == [0b1010, 0b10100]
+
+
+def test_subset_of_selected_path_unblocks_other_paths():
+    # (0, 1) replaces the selected (0, 1, 2), which was the only path in the way of (0, 2, 3)
+    store = DisjointPathStore(0, 2)
+    assert not store.add((0, 1, 2))
+    assert not store.add((0, 2, 3))
+    assert store.add((0, 1))
+    assert sorted(store._selected) == [0b10, 0b1100]
+
+
+def test_bound_drops_the_longest_unselected_path():
+    store = DisjointPathStore(0, 10, max_paths=2)
+    store.add((0, 1, 2))
+    store.add((0, 1, 3, 4))
+    store.add((0, 1, 5))
+    assert sorted(store.paths) == [0b110, 0b100010]
+
+
+class CountingStore(DisjointPathStore):
+    searches = 0
+
+    def _find_disjoint(self, candidates, size, used):
+        CountingStore.searches += 1
+        return super()._find_disjoint(candidates, size, used)
+
+
+def test_paths_through_few_nodes_skip_the_search():
+    # A tampering node sends paths that all pass one of three hubs, so there are never more than three disjoint paths
+    rng = random.Random(0)
+    store = CountingStore(0, 4)
+    for _ in range(600):
+        a, b = rng.sample(range(4, 64), 2)
+        assert not store.add((0, a, rng.choice((1, 2, 3)), b))
+    assert store.disjoint_paths == 3
+    # Once the hubs are the smallest set of nodes every path goes through, adds no longer search
+    assert CountingStore.searches < 100
+
+
+def test_search_that_runs_out_of_steps_is_resumed():
+    store = DisjointPathStore(0, 3, search_budget=0)
+    store.add((0, 1, 2))
+    store.add((0, 1, 3))
+    assert not store.add((0, 2, 4))
+    assert store.disjoint_paths == 1 and store._stale
+    store.search_budget = 100
+    # A disjoint path grows the selection greedily, and the search over all paths finds the other two
+    assert store.add((0, 7, 8))
@@ -0,0 +1,32 @@
+import argparse
+
+from sweep import row, run_status
+
+ARGS = argparse.Namespace(broadcasts=2)
+
+
+def result(**values) -> dict:
+    return {"algorithm": "dolev", "nodes": 4, "degree": 3, "max_fault": 1, "md": "none", "inject": "none",
+            "started": 4, "stopped": 4, "deliveries": 8, **values}
+
+
+def test_run_without_every_delivery_is_incomplete():
+    assert run_status(result(), ARGS) == "ok"
+    assert run_status(result(deliveries=0), ARGS) == "incomplete"
+    assert run_status(result(deliveries=7), ARGS) == "incomplete"
+
+
+def test_run_with_injected_faults_only_needs_every_node_to_stop():
+    assert run_status(result(inject="config/faults.yaml", deliveries=0), ARGS) == "ok"
+    assert run_status(result(inject="config/faults.yaml", stopped=3), ARGS) == "incomplete"
+
+
+def test_runs_of_other_algorithms_need_every_node_to_stop():
+    election = {"algorithm": "election", "nodes": 4, "degree": 2, "max_fault": 0, "started": 4, "stopped": 4}
+    assert run_status(election, ARGS) == "ok"
+    assert run_status({**election, "stopped": 0}, ARGS) == "incomplete"
+
+
+def test_table_shows_no_fault_file_for_none():
+    assert row(result())["inject"] == "-"
+    assert row(result(inject="config/faults.yaml"))["inject"] == "faults.yaml"
@@ -0,0 +1,64 @@
+import pytest
+
+from topo_generator import (
+    Graph, MODELS, erdos_renyi, generate, harary, is_k_vertex_connected, k_connected, k_regular, scale_free,
+    small_world, tolerates_faults, vertex_connectivity,
+)
+
+
+def cycle(n: int) -> Graph:
+    return Graph.from_edges(n, [(v, (v + 1) % n) for v in range(n)])
+
+
+def test_vertex_connectivity_of_known_graphs():
+    assert vertex_connectivity(Graph.from_edges(4, [(0, 1), (1, 2), (2, 3)])) == 1
+    assert vertex_connectivity(cycle(6)) == 2
+    assert vertex_connectivity(erdos_renyi(6, 1.0)) == 5
+
+
+@pytest.mark.parametrize("n, k", [(7, 2), (7, 3), (8, 3), (10, 4), (11, 5)])
+def test_harary_graph_is_exactly_k_connected_with_minimum_degree(n, k):
+    graph = harary(n, k)
+    assert graph.min_degree() == k
+    assert graph.edge_count == (k * n + 1) // 2
+    assert is_k_vertex_connected(graph, k)
+    assert not is_k_vertex_connected(graph, k + 1)
+
+
+@pytest.mark.parametrize("k", [3, 5, 7])
+def test_k_connected_guarantees_connectivity(k):
+    for seed in range(3):
+        graph = k_connected(30, k, extra_edges=10, seed=seed)
+        assert is_k_vertex_connected(graph, k)
+        assert tolerates_faults(graph, (k - 1) // 2)
+
+
+def test_k_regular_degrees():
+    graph = k_regular(20, 4, seed=1)
+    assert all(graph.degree(v) == 4 for v in range(20))
+    # n * k odd: one node gets the one extra edge end
+    odd = k_regular(11, 3, seed=1)
+    assert sorted(odd.degree(v) for v in range(11)) == [3] * 10 + [4]
+
+
+def test_generators_are_reproducible_per_seed():
+    for model in MODELS:
+        assert generate(model, 40, 4, seed=7).to_dict() == generate(model, 40, 4, seed=7).to_dict()
+    assert k_regular(40, 4, seed=1).to_dict() != k_regular(40, 4, seed=2).to_dict()
+
+
+def test_small_world_and_scale_free_degrees():
+    graph = small_world(30, 4, 0.3, seed=0)
+    assert graph.edge_count == 30 * 4 // 2
+    assert scale_free(50, 3, seed=0).min_degree() >= 3
+
+
+def test_fault_tolerance_needs_2f_plus_1_connectivity():
+    assert tolerates_faults(harary(10, 3), 1)
+    assert not tolerates_faults(harary(10, 2), 1)
+    assert not tolerates_faults(harary(10, 4), 2)
+
+
+def test_unknown_model_is_rejected():
+    with pytest.raises(ValueError):
+        generate("tree", 10, 3)